@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Query
+from modules.db_pool import unit_of_work
+from modules.settlement import top_up_account, settle_funded_accounts, BULK_BATCH_ACCOUNTS
+
+router = APIRouter()
+
+
+@router.post("/top-up")
+def top_up(
+    account_id: str = Query(..., description="Account to credit"),
+    amount: float = Query(..., description="Credit amount, settles unpaid tolls oldest first")
+):
+    if amount <= 0:
+        return {"status": "ERROR", "message": "Top-up amount must be positive."}
+    try:
+        with unit_of_work() as uow:
+            result = top_up_account(uow.cur, account_id, amount)
+            uow.mark_financial()
+        if result is None:
+            return {"status": "ERROR", "message": "Account not found or inactive."}
+        return {"status": "OK", "message": "Account topped up.", "data": result}
+    except Exception as e:
+        return {"status": "ERROR", "message": str(e)}
+
+
+@router.post("/settle")
+def settle_all(batch_accounts: int = Query(BULK_BATCH_ACCOUNTS, ge=1, le=10000)):
+    try:
+        return {"status": "OK", "settlement": settle_funded_accounts(batch_accounts)}
+    except Exception as e:
+        return {"status": "ERROR", "message": str(e)}
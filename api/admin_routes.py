@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from modules.reference_cache import reference_cache
+from modules.watchlist import watchlist
+from modules.resolution_cache import resolution_cache
+from modules.logger import logging_stats
+from modules.profiler import profiler, profiler_enabled
+from modules.partitions import partition_maintenance, partition_maintenance_enabled
+
+router = APIRouter()
+
+
+@router.get("/reference")
+def reference_stats():
+    return {"status": "OK", "reference_cache": reference_cache.stats()}
+
+
+@router.post("/reference/refresh")
+def refresh_reference():
+    try:
+        reference_cache.refresh()
+        return {"status": "OK", "reference_cache": reference_cache.stats()}
+    except Exception as e:
+        return {"status": "ERROR", "message": str(e)}
+
+
+@router.get("/watchlist")
+def watchlist_stats():
+    return {"status": "OK", "watchlist": watchlist.stats()}
+
+
+@router.post("/watchlist/refresh")
+def refresh_watchlist():
+    try:
+        watchlist.refresh()
+        return {"status": "OK", "watchlist": watchlist.stats()}
+    except Exception as e:
+        return {"status": "ERROR", "message": str(e)}
+
+
+@router.get("/resolution-cache")
+def resolution_cache_stats():
+    return {"status": "OK", "resolution_cache": resolution_cache.stats()}
+
+
+@router.post("/resolution-cache/clear")
+def clear_resolution_cache():
+    resolution_cache.clear()
+    return {"status": "OK", "resolution_cache": resolution_cache.stats()}
+
+
+@router.get("/logging")
+def logging_backend_stats():
+    return {"status": "OK", "logging": logging_stats()}
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+def download_profile(route: str = Query(None, description="Only stacks under this route path")):
+    """Collapsed stacks, one 'frame;frame;... count' line each (flamegraph.pl / speedscope)."""
+    return PlainTextResponse(profiler.collapsed(route), headers={
+        "Content-Disposition": 'attachment; filename="anpr_profile.folded"'
+    })
+
+
+@router.get("/profile/stats")
+def profile_stats():
+    return {"status": "OK", "enabled": profiler_enabled, "profiler": profiler.stats()}
+
+
+@router.post("/profile/reset")
+def reset_profile():
+    profiler.reset()
+    return {"status": "OK", "profiler": profiler.stats()}
+
+
+@router.get("/partitions")
+def partition_stats():
+    return {"status": "OK", "enabled": partition_maintenance_enabled, "partitions": partition_maintenance.stats()}
+
+
+@router.post("/partitions/run")
+def run_partition_maintenance():
+    try:
+        return {"status": "OK", "report": partition_maintenance.run(), "partitions": partition_maintenance.stats()}
+    except Exception as e:
+        return {"status": "ERROR", "message": str(e)}
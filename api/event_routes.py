@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from modules.event_bus import event_bus, stream_events, STREAM_HEARTBEAT_SECONDS
+
+router = APIRouter()
+
+EVENT_KINDS = ("notification", "security_alert", "security_incident")
+
+
+def _csv(value):
+    return {item.strip() for item in value.split(",") if item.strip()} if value else None
+
+
+@router.get("/stream")
+async def stream(
+    request: Request,
+    kinds: str = Query(None, description="Comma-separated: notification, security_alert, security_incident"),
+    plaza_id: str = Query(None),
+    type: str = Query(None, description="Comma-separated notification / alert / incident types"),
+    priority: str = Query(None, description="Comma-separated priorities (severity for incidents)"),
+    last_event_id: str = Query(None, description="Resume after this event id (or send Last-Event-ID)"),
+    last_event_id_header: str = Header(None, alias="Last-Event-ID")
+):
+    """Server-sent events for committed notifications, security alerts and incidents."""
+    kind_filter = _csv(kinds)
+    if kind_filter and not kind_filter <= set(EVENT_KINDS):
+        return {"status": "ERROR", "message": f"kinds must be a subset of {', '.join(EVENT_KINDS)}."}
+
+    frames = stream_events(
+        event_bus, request.is_disconnected,
+        last_event_id=last_event_id_header or last_event_id,
+        heartbeat=STREAM_HEARTBEAT_SECONDS,
+        kinds=kind_filter, plaza_id=plaza_id, types=_csv(type), priorities=_csv(priority)
+    )
+    return StreamingResponse(frames, media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+@router.get("/stats")
+def stream_stats():
+    return {"status": "OK", "events": event_bus.stats()}
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Query
-from typing import Optional
-from modules.toll_logic import process_toll_flexible
+from fastapi import APIRouter, Body, Query
+from typing import List, Optional, Union
+from modules.toll_logic import process_toll_flexible, process_toll_batch, MAX_BATCH_EVENTS
 
 router = APIRouter()
 
@@ -15,3 +15,18 @@ def process_toll(
 
     result = process_toll_flexible(plaza_id, license_plate, tag_id)
     return {"status": "OK", "result": result}
+
+
+@router.post("/process/batch")
+def process_toll_events(
+    events: List[Union[dict, list]] = Body(..., description="Buffered lane events: "
+                                           "{plaza_id, license_plate, tag_id, timestamp} "
+                                           "or [plaza_id, license_plate, tag_id, timestamp]")
+):
+    if not events:
+        return {"status": "ERROR", "message": "At least one event must be provided."}
+    if len(events) > MAX_BATCH_EVENTS:
+        return {"status": "ERROR", "message": f"A batch may contain at most {MAX_BATCH_EVENTS} events."}
+
+    results = process_toll_batch(events)
+    return {"status": "OK", "count": len(results), "results": results}
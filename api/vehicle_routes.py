@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Body
-import psycopg2
-import json
+from modules.db_pool import pooled_connection
 import random
 from datetime import datetime
 from modules.vehicle import register_vehicle_with_rfid
@@ -9,27 +8,14 @@ from datetime import timedelta
 
 router = APIRouter()
 
-def get_connection():
-    with open("configs/config.json") as f:
-        db_config = json.load(f)
-    return psycopg2.connect(
-        dbname=db_config["database"],
-        user=db_config["username"],
-        password=db_config["password"],
-        host=db_config["host"],
-        port=db_config["port"]
-    )
-
 
 @router.post("/register")
 def register_vehicle(payload: dict = Body(...)):
     try:
-        conn = get_connection()
-        conn.autocommit = True
         if "tag_id" not in payload:
             raise ValueError("Missing 'tag_id' in payload")
 
-        with conn.cursor() as cur:
+        with pooled_connection() as conn, conn.cursor() as cur:
             plate = payload.get("license_plate") or payload.get("plate")
             if not plate:
                 return {"status": "ERROR", "message": "License plate is required."}
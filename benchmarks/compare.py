@@ -0,0 +1,41 @@
+"""
+    Compare two result files written by benchmarks.toll_load:
+
+        python -m benchmarks.compare benchmarks/results/baseline_*.json benchmarks/results/candidate_*.json
+"""
+import json
+import sys
+
+from benchmarks.toll_load import PERCENTILES
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def delta(before, after):
+    if before is None or after is None:
+        return "n/a"
+    if before == 0:
+        return f"{after:+.3f}"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main(before_path, after_path):
+    before, after = load(before_path), load(after_path)
+    print(f"{before['label']} -> {after['label']}")
+    print(f"  throughput: {before['throughput_rps']} -> {after['throughput_rps']} rps "
+          f"({delta(before['throughput_rps'], after['throughput_rps'])})")
+    for endpoint in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        b, a = before["endpoints"].get(endpoint, {}), after["endpoints"].get(endpoint, {})
+        print(f"  {endpoint}:")
+        for p in PERCENTILES:
+            key = f"p{p}_ms"
+            print(f"    {key:<10}{str(b.get(key)):>10} -> {str(a.get(key)):<10} {delta(b.get(key), a.get(key))}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m benchmarks.compare BEFORE.json AFTER.json")
+    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,120 @@
+"""
+    Pure decision-path throughput: process_toll_flexible against an InMemoryRepository,
+    so no database, network or pool is involved.
+
+        python -m benchmarks.decision_path --vehicles 100000 --decisions 1000000 --threads 1
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from modules.repository import InMemoryRepository
+from modules.toll_logic import process_toll_flexible
+
+VEHICLE_TYPES = {"SEDAN": 5.00, "SUV": 6.50, "TRUCK": 8.75}
+
+
+def build_repository(args, rng):
+    repo = InMemoryRepository()
+    plazas = [f"PLZ{i + 1:03d}" for i in range(args.plazas)]
+    for plaza in plazas:
+        repo.add_plaza(plaza)
+    for type_code, cost in VEHICLE_TYPES.items():
+        repo.add_vehicle_type(type_code, cost)
+
+    passages = []
+    for i in range(args.vehicles):
+        owner = f"OWN{i:08d}"
+        low = rng.random() < args.low_balance_ratio
+        repo.add_account(owner, 1.0 if low else 1e9)
+        plate, tag = f"EU-{i:08d}", f"TAG{i:010d}"
+        vehicle_id = repo.add_vehicle(plate, rng.choice(list(VEHICLE_TYPES)), owner)
+        if rng.random() < args.tagged_ratio:
+            repo.add_tag(tag, vehicle_id)
+        else:
+            tag = None
+        roll = rng.random()
+        if roll < args.stolen_ratio:
+            repo.report_stolen(plate)
+        elif tag and roll < args.stolen_ratio + args.blacklisted_ratio:
+            repo.blacklist_tag(tag, "Cloned tag", "HIGH")
+        passages.append((plate, tag))
+
+    unknown = [(f"XX-{i:08d}", None) for i in range(max(args.vehicles // 100, 1))]
+    return repo, plazas, passages, unknown
+
+
+def make_events(args, rng, plazas, passages, unknown):
+    events = []
+    for _ in range(args.decisions):
+        plate, tag = rng.choice(unknown) if rng.random() < args.unknown_ratio else rng.choice(passages)
+        if tag and rng.random() < 0.5:
+            plate = None
+        events.append((rng.choice(plazas), plate, tag))
+    return events
+
+
+def run(repo, events, threads):
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker(chunk):
+        local = Counter(process_toll_flexible(p, plate, tag, repository=repo)["status"] for p, plate, tag in chunk)
+        with lock:
+            statuses.update(local)
+
+    size = (len(events) + threads - 1) // threads
+    pool = [threading.Thread(target=worker, args=(events[i:i + size],)) for i in range(0, len(events), size)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - started, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Toll decision-path throughput without a database")
+    parser.add_argument("--vehicles", type=int, default=100000)
+    parser.add_argument("--plazas", type=int, default=50)
+    parser.add_argument("--decisions", type=int, default=500000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--tagged-ratio", type=float, default=0.8)
+    parser.add_argument("--low-balance-ratio", type=float, default=0.05)
+    parser.add_argument("--stolen-ratio", type=float, default=0.001)
+    parser.add_argument("--blacklisted-ratio", type=float, default=0.001)
+    parser.add_argument("--unknown-ratio", type=float, default=0.02)
+    parser.add_argument("--log-level", default="WARNING", help="level for the app loggers during the run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="optional JSON result path")
+    args = parser.parse_args()
+
+    for name in ("general_logger", "txn_logger", "alert_logger"):
+        logging.getLogger(name).setLevel(args.log_level)
+
+    rng = random.Random(args.seed)
+    repo, plazas, passages, unknown = build_repository(args, rng)
+    events = make_events(args, rng, plazas, passages, unknown)
+    elapsed, statuses = run(repo, events, args.threads)
+
+    report = {
+        "decisions": len(events),
+        "threads": args.threads,
+        "elapsed_seconds": round(elapsed, 3),
+        "decisions_per_minute": round(len(events) / elapsed * 60),
+        "mean_us": round(elapsed / len(events) * 1e6, 2),
+        "statuses": dict(statuses.most_common()),
+        "config": vars(args),
+    }
+    print(json.dumps({k: v for k, v in report.items() if k != "config"}, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+    Image-quality scoring throughput: the per-frame cv2 path (assess_image_quality) versus
+    the vectorized batch scorer (assess_image_quality_batch) on the same synthetic frames.
+
+        python -m benchmarks.image_quality --frames 64 --height 720 --width 1280
+        python -m benchmarks.image_quality --frames 2048 --height 96 --width 320   # plate crops
+"""
+import argparse
+import json
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from modules.all_in_one_module import assess_image_quality, assess_image_quality_batch
+
+
+def make_frames(args, rng):
+    """Noise frames with a mix of sharp, blurred and dark/bright captures, so all classes occur."""
+    frames = rng.integers(0, 256, (args.frames, args.height, args.width, 3), dtype=np.uint8)
+    for i in range(args.frames):
+        kind = i % 4
+        if kind == 1:
+            frames[i] = cv2.GaussianBlur(frames[i], (0, 0), 2.0)
+        elif kind == 2:
+            frames[i] = cv2.GaussianBlur(frames[i], (0, 0), 6.0)
+        elif kind == 3:
+            frames[i] //= 6
+    return frames
+
+
+def time_best(func, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame vs batched image quality scoring")
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs per path")
+    parser.add_argument("--cv-threads", type=int, default=1, help="cv2.setNumThreads for the per-frame path")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="optional JSON result path")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(args.cv_threads)
+    frames = make_frames(args, np.random.default_rng(args.seed))
+
+    per_frame_seconds, per_frame = time_best(lambda: [assess_image_quality(frame) for frame in frames], args.repeat)
+    batch_seconds, batch = time_best(lambda: assess_image_quality_batch(frames), args.repeat)
+
+    report = {
+        "frames": args.frames,
+        "shape": [args.height, args.width, 3],
+        "per_frame_fps": round(args.frames / per_frame_seconds, 1),
+        "batch_fps": round(args.frames / batch_seconds, 1),
+        "speedup": round(per_frame_seconds / batch_seconds, 2),
+        "agreement": round(sum(a == b for a, b in zip(per_frame, batch)) / args.frames, 4),
+        "classes": {quality.value: count for quality, count in Counter(batch).items()},
+        "config": vars(args),
+    }
+    print(json.dumps({k: v for k, v in report.items() if k != "config"}, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
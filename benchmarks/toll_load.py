@@ -0,0 +1,333 @@
+"""
+    HTTP load generator for the toll API.
+
+    Drives /toll/process, /notifications/ and /vehicle/register at a fixed (Poisson) arrival
+    rate with a bounded number of in-flight requests, and reports throughput plus
+    p50/p95/p99/p99.9 latency per endpoint and per outcome status. Results are written as
+    JSON so runs against different versions can be diffed.
+
+    Plates and tags for each population (known, unknown, blacklisted, stolen, low balance)
+    are sampled from the database the API points at, so run it from the repository root:
+
+        python -m benchmarks.toll_load --rate 200 --duration 60 --concurrency 64 \\
+            --mix known=70,unknown=10,blacklisted=5,stolen=5,low_balance=10 --label baseline
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from modules.db_pool import pooled_connection
+
+PERCENTILES = (50, 95, 99, 99.9)
+POPULATIONS = ("known", "unknown", "blacklisted", "stolen", "low_balance")
+
+
+def parse_mix(text):
+    """'known=70,unknown=30' -> {'known': 70.0, 'unknown': 30.0}"""
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def weighted_choice(rng, mix):
+    names = list(mix)
+    return rng.choices(names, weights=[mix[n] for n in names])[0]
+
+
+def load_populations(sample_size, low_balance_below):
+    """Sample (plate, tag) pairs for every population straight from the database."""
+    populations = {}
+    with pooled_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT v.license_plate, r.tag_id
+            FROM vehicles v
+            JOIN rfid_tags r ON r.vehicle_id = v.vehicle_id AND r.is_active = TRUE
+            JOIN accounts a ON a.owner_id = v.owner_id AND a.is_active = TRUE
+            WHERE a.balance >= %s
+            LIMIT %s
+        """, (low_balance_below, sample_size))
+        populations["known"] = cur.fetchall()
+
+        cur.execute("""
+            SELECT v.license_plate, r.tag_id
+            FROM vehicles v
+            JOIN rfid_tags r ON r.vehicle_id = v.vehicle_id AND r.is_active = TRUE
+            JOIN accounts a ON a.owner_id = v.owner_id AND a.is_active = TRUE
+            WHERE a.balance < %s
+            LIMIT %s
+        """, (low_balance_below, sample_size))
+        populations["low_balance"] = cur.fetchall()
+
+        cur.execute("""
+            SELECT v.license_plate, b.tag_id
+            FROM blacklisted_rfid b
+            LEFT JOIN rfid_tags r ON r.tag_id = b.tag_id
+            LEFT JOIN vehicles v ON v.vehicle_id = r.vehicle_id
+            LIMIT %s
+        """, (sample_size,))
+        populations["blacklisted"] = cur.fetchall()
+
+        cur.execute("""
+            SELECT s.licensePlate, NULL FROM stolen_vehicle_registry s
+            WHERE s.status = TRUE
+            LIMIT %s
+        """, (sample_size,))
+        populations["stolen"] = cur.fetchall()
+
+        cur.execute("SELECT plaza_id FROM toll_plazas WHERE is_operational = TRUE")
+        plazas = [row[0] for row in cur.fetchall()]
+
+        cur.execute("SELECT owner_id FROM owners LIMIT %s", (sample_size,))
+        owners = [row[0] for row in cur.fetchall()]
+
+        cur.execute("SELECT type_code FROM lov_vehicle_types")
+        vehicle_types = [row[0] for row in cur.fetchall()]
+
+    rng = random.Random(0)
+    populations["unknown"] = [
+        (f"BM-{rng.randint(0, 9999):04d}-{rng.choice('XYZ')}{rng.choice('XYZ')}", f"BMTAG{i:07d}")
+        for i in range(sample_size)
+    ]
+    return populations, plazas, owners, vehicle_types
+
+
+class Recorder:
+    """Collects raw latencies per (endpoint, status); percentiles are exact, not bucketed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.dropped = 0
+
+    def record(self, endpoint, status, seconds):
+        with self._lock:
+            self.samples[(endpoint, status)].append(seconds)
+
+    def drop(self):
+        with self._lock:
+            self.dropped += 1
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(int(math.ceil(p / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[k]
+
+
+def histogram(sorted_values):
+    """Counts per power-of-two millisecond bucket: {'<=1ms': n, '<=2ms': n, ...}."""
+    buckets = defaultdict(int)
+    for value in sorted_values:
+        ms = value * 1000.0
+        bound = 1
+        while ms > bound:
+            bound *= 2
+        buckets[f"<={bound}ms"] += 1
+    return dict(sorted(buckets.items(), key=lambda kv: int(kv[0][2:-2])))
+
+
+def summarize(values, elapsed):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else None,
+        **{f"p{p}_ms": round(percentile(values, p) * 1000, 3) if values else None for p in PERCENTILES},
+        "max_ms": round(values[-1] * 1000, 3) if values else None,
+        "histogram": histogram(values),
+    }
+
+
+class LoadRun:
+    def __init__(self, args, populations, plazas, owners, vehicle_types):
+        self.args = args
+        self.base_url = args.url.rstrip("/")
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.endpoint_mix = parse_mix(args.endpoints)
+        self.population_mix = {k: v for k, v in parse_mix(args.mix).items() if populations.get(k)}
+        self.plaza_mix = parse_mix(args.plazas) if args.plazas else {p: 1.0 for p in plazas}
+        self.populations = populations
+        self.owners = owners
+        self.vehicle_types = vehicle_types or ["SEDAN"]
+        self.recorder = Recorder()
+        self.in_flight = threading.BoundedSemaphore(args.concurrency)
+        self.registrations = 0
+
+        if not self.population_mix:
+            raise SystemExit("None of the requested populations has any rows in the database")
+        if not self.plaza_mix:
+            raise SystemExit("No operational toll plazas found")
+
+    # ---- request builders ----
+
+    def _toll_request(self, rng):
+        population = weighted_choice(rng, self.population_mix)
+        plate, tag = rng.choice(self.populations[population])
+        params = {"plaza_id": weighted_choice(rng, self.plaza_mix)}
+        mode = rng.choices(("plate", "tag", "both"), weights=(self.args.plate_only, self.args.tag_only,
+                                                             self.args.plate_and_tag))[0]
+        if plate and (mode in ("plate", "both") or not tag):
+            params["license_plate"] = plate
+        if tag and (mode in ("tag", "both") or not plate):
+            params["tag_id"] = tag
+        return "POST", "/toll/process?" + urllib.parse.urlencode(params), None
+
+    def _notification_request(self, rng):
+        population = weighted_choice(rng, self.population_mix)
+        plate, tag = rng.choice(self.populations[population])
+        params = {"plate": plate} if plate else {"tag_id": tag}
+        return "GET", "/notifications/?" + urllib.parse.urlencode(params), None
+
+    def _register_request(self, rng):
+        self.registrations += 1
+        suffix = f"{self.args.seed % 1000:03d}{self.registrations:07d}"
+        payload = {
+            "license_plate": f"BR-{suffix}",
+            "tag_id": f"BRTAG{suffix}",
+            "owner_id": rng.choice(self.owners),
+            "vehicle_type": rng.choice(self.vehicle_types),
+            "model": "Benchmark",
+            "color": "Grey",
+        }
+        return "POST", "/vehicle/register", json.dumps(payload).encode("utf-8")
+
+    def next_request(self):
+        with self.rng_lock:
+            endpoint = weighted_choice(self.rng, self.endpoint_mix)
+            build = {"toll": self._toll_request,
+                     "notifications": self._notification_request,
+                     "register": self._register_request}[endpoint]
+            return (endpoint,) + build(self.rng)
+
+    # ---- execution ----
+
+    def _send(self, endpoint, method, path, body):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={"Content-Type": "application/json"})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.args.timeout) as response:
+                payload = json.loads(response.read() or b"{}")
+            status = outcome_status(payload)
+        except urllib.error.HTTPError as e:
+            status = f"HTTP_{e.code}"
+        except Exception as e:
+            status = f"CLIENT_{type(e).__name__}"
+        finally:
+            self.in_flight.release()
+        self.recorder.record(endpoint, status, time.perf_counter() - started)
+
+    def run(self):
+        args = self.args
+        arrivals = random.Random(args.seed + 1)
+        deadline = time.perf_counter() + args.duration
+        next_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            started = time.perf_counter()
+            while next_at < deadline:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                # Open loop: if every slot is busy the arrival is counted as dropped, not delayed
+                if self.in_flight.acquire(blocking=False):
+                    pool.submit(self._send, *self.next_request())
+                else:
+                    self.recorder.drop()
+                next_at += arrivals.expovariate(args.rate)
+        return time.perf_counter() - started
+
+
+def outcome_status(payload):
+    """Toll responses wrap the decision in result; everything else carries status at the top."""
+    result = payload.get("result")
+    if isinstance(result, dict) and "status" in result:
+        return result["status"]
+    if "status" in payload:
+        return payload["status"]
+    return "OK" if "notifications" in payload else "UNKNOWN"
+
+
+def build_report(run, elapsed):
+    by_endpoint = defaultdict(list)
+    by_status = {}
+    for (endpoint, status), values in run.recorder.samples.items():
+        by_endpoint[endpoint].extend(values)
+        by_status.setdefault(endpoint, {})[status] = summarize(values, elapsed)
+    total = sum(len(v) for v in by_endpoint.values())
+    return {
+        "label": run.args.label,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(run.args),
+        "elapsed_seconds": round(elapsed, 3),
+        "completed": total,
+        "dropped_arrivals": run.recorder.dropped,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "endpoints": {endpoint: {**summarize(values, elapsed), "by_status": by_status[endpoint]}
+                      for endpoint, values in by_endpoint.items()},
+    }
+
+
+def print_report(report):
+    print(f"{report['label']}: {report['completed']} requests in {report['elapsed_seconds']}s "
+          f"({report['throughput_rps']} rps, {report['dropped_arrivals']} arrivals dropped)")
+    header = f"{'endpoint':<14}{'status':<22}{'count':>8}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES)
+    print(header)
+    for endpoint, stats in report["endpoints"].items():
+        rows = [("ALL", stats)] + sorted(stats["by_status"].items())
+        for status, s in rows:
+            print(f"{endpoint:<14}{status:<22}{s['count']:>8}"
+                  + "".join(f"{s[f'p{p}_ms']:>10}" for p in PERCENTILES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the ANPR toll API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rate", type=float, default=50.0, help="mean arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=32, help="max requests in flight")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--endpoints", default="toll=90,notifications=9,register=1")
+    parser.add_argument("--mix", default="known=70,unknown=10,blacklisted=5,stolen=5,low_balance=10",
+                        help=f"population weights, any of {', '.join(POPULATIONS)}")
+    parser.add_argument("--plazas", default="", help="plaza weights, e.g. PLZ001=5,PLZ002=1 (default: uniform)")
+    parser.add_argument("--plate-only", type=float, default=20.0)
+    parser.add_argument("--tag-only", type=float, default=20.0)
+    parser.add_argument("--plate-and-tag", type=float, default=60.0)
+    parser.add_argument("--low-balance-below", type=float, default=10.0)
+    parser.add_argument("--sample-size", type=int, default=5000, help="rows sampled per population")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output-dir", default="benchmarks/results")
+    args = parser.parse_args()
+
+    populations, plazas, owners, vehicle_types = load_populations(args.sample_size, args.low_balance_below)
+    run = LoadRun(args, populations, plazas, owners, vehicle_types)
+    elapsed = run.run()
+    report = build_report(run, elapsed)
+    print_report(report)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"{args.label}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
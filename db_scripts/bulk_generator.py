@@ -0,0 +1,359 @@
+"""
+    Production-scale synthetic data for the ANPR schema, streamed through COPY.
+
+    Every table is split into chunks of --chunk-size rows that worker processes generate
+    and COPY independently, each on its own connection. Keys are a pure function of
+    (seed, row index), so foreign keys line up across workers without coordination, and the
+    same seed and chunk size always produce the same database.
+
+        python db_scripts/bulk_generator.py --vehicles 10000000 --tags 8000000 --plazas 200 \\
+            --transactions 500000000 --notifications 20000000 --ledger 5000000 --workers 8
+
+    Run from the repository root (reads configs/config.json). Tables are appended to; pass
+    --truncate to empty them first. With db_scripts/watchlist.sql installed every blacklisted
+    or stolen row also fires a NOTIFY; keep those counts modest or drop the triggers for the load.
+"""
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import psycopg2
+
+VEHICLE_TYPES = [
+    ("SEDAN", "Standard Sedan", 5.00),
+    ("SUV", "Sport Utility Vehicle", 6.50),
+    ("TRUCK", "Heavy Truck", 8.75),
+]
+FINES = [
+    ("EXPIRED_TAG", "RFID tag expired", 100.00),
+    ("BLACKLISTED_TAG", "Blacklisted RFID tag used", 250.00),
+    ("SKIPPED_TOLL", "Toll bypassed without payment", 75.00),
+]
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Eva", "Felix", "Greta", "Hannes", "Ida", "Jonas", "Lena", "Max"]
+LAST_NAMES = ["Schmidt", "Müller", "Weber", "Fischer", "Wagner", "Becker", "Hoffmann", "Koch", "Richter", "Klein"]
+CITIES = ["Berlin", "Munich", "Hamburg", "Cologne", "Frankfurt", "Stuttgart", "Leipzig", "Dresden", "Bremen"]
+STREETS = ["Elm Street", "Oak Avenue", "Pine Lane", "Hauptstrasse", "Bahnhofstrasse", "Ringweg"]
+MODELS = ["Volkswagen", "BMW", "Audi", "Ford", "Toyota", "Mercedes", "Skoda", "Opel"]
+COLORS = ["Black", "White", "Silver", "Grey", "Blue", "Red", "Green"]
+NOTIFICATION_TYPES = [
+    ("LOW_BALANCE", "HIGH", "Insufficient balance for toll"),
+    ("TAG_MISSING", "MEDIUM", "No active RFID tag found"),
+    ("UNMATCHED_PLATE", "MEDIUM", "Plate does not match RFID tag"),
+    ("LICENSE_MISSING", "MEDIUM", "Tag has no registered license plate"),
+    ("UNKNOWN_TAG", "LOW", "Unknown RFID tag presented"),
+]
+
+TABLE_COLUMNS = {
+    "owners": "owner_id, name, phone_number, email, address",
+    "accounts": "account_id, owner_id, balance, account_type, is_active, risk_level",
+    "vehicles": "vehicle_id, license_plate, vehicle_type, model, color, registration_date, owner_id",
+    "rfid_tags": "tag_id, is_active, issue_date, expiry_date, vehicle_id",
+    "toll_transactions": "transaction_id, timestamp, amount, distance, status, security_flag, rfid_tag_id, plaza_id",
+    "notification": "notification_id, message, timestamp, type, priority, status, vehicle_id, plaza_id",
+    "pending_toll_ledger": "ledger_id, vehicle_id, tag_id, plaza_id, amount_due, created_at, resolved",
+    "blacklisted_rfid": "tag_id, reason, blacklistedDate, reportedBy, severity",
+    "stolen_vehicle_registry": "licensePlate, vehicleID, reportedDate, reportingAgency, status",
+}
+
+# Load order: parents before children; the history tables only depend on the first four
+PHASES = [
+    ["owners"],
+    ["accounts", "vehicles"],
+    ["rfid_tags", "stolen_vehicle_registry"],
+    ["toll_transactions", "notification", "pending_toll_ledger", "blacklisted_rfid"],
+]
+
+
+def load_db_config(path="configs/config.json"):
+    with open(path) as f:
+        return json.load(f)
+
+
+def connect(db_config):
+    return psycopg2.connect(
+        dbname=db_config["database"],
+        user=db_config["username"],
+        password=db_config["password"],
+        host=db_config["host"],
+        port=db_config["port"]
+    )
+
+
+# ---- deterministic keys (pure functions of seed + index) ----
+
+def stable_uuid(seed, kind, i):
+    return str(uuid.UUID(bytes=hashlib.md5(f"{seed}:{kind}:{i}".encode()).digest(), version=4))
+
+
+def owner_id(i):
+    return f"OWN{i + 1:09d}"
+
+
+def plaza_id(i):
+    return f"PLZ{i + 1:03d}"
+
+
+def license_plate(i):
+    # Unique per index: the number carries i, the letter pair cycles independently
+    return f"EU-{i:08d}-{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}"
+
+
+def tag_id(i):
+    return f"TAG{i:010d}"
+
+
+def vehicle_type_index(i):
+    # Cheap multiplicative hash so types are spread evenly but stay a function of i
+    return (i * 2654435761) % len(VEHICLE_TYPES)
+
+
+# ---- COPY text helpers ----
+
+def copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", " ").replace("\n", " ")
+
+
+def random_moment(rng, start, span_seconds):
+    return start + timedelta(seconds=rng.random() * span_seconds)
+
+
+# ---- row generators, one per table: (args, rng, index) -> tuple ----
+
+def gen_owner(args, rng, i):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return (
+        owner_id(i), f"{first} {last}", f"+49{rng.randint(1500000000, 1799999999)}",
+        f"{first.lower()}.{last.lower()}{i}@example.com",
+        f"{rng.randint(1, 250)} {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+    )
+
+
+def gen_account(args, rng, i):
+    if rng.random() < args.low_balance_ratio:
+        balance = round(rng.uniform(0, 5), 2)
+    else:
+        balance = round(rng.uniform(5, 500), 2)
+    return (
+        stable_uuid(args.seed, "account", i), owner_id(i), balance,
+        rng.choice(["PERSONAL", "CORPORATE"]), rng.random() < 0.98, rng.choice(["LOW", "MEDIUM", "HIGH"])
+    )
+
+
+def gen_vehicle(args, rng, i):
+    return (
+        stable_uuid(args.seed, "vehicle", i), license_plate(i), VEHICLE_TYPES[vehicle_type_index(i)][0],
+        rng.choice(MODELS), rng.choice(COLORS),
+        args.today - timedelta(days=rng.randint(0, 3650)), owner_id(rng.randrange(args.owners))
+    )
+
+
+def gen_tag(args, rng, i):
+    # Tag i belongs to vehicle i, so tags <= vehicles and every tag has a vehicle
+    issue = args.today - timedelta(days=rng.randint(0, 1000))
+    return (tag_id(i), rng.random() < 0.95, issue, issue + timedelta(days=3 * 365),
+            stable_uuid(args.seed, "vehicle", i))
+
+
+def gen_transaction(args, rng, i):
+    tag = rng.randrange(args.tags)
+    paid = rng.random() < 0.97
+    return (
+        stable_uuid(args.seed, "txn", i), random_moment(rng, args.history_start, args.history_seconds),
+        VEHICLE_TYPES[vehicle_type_index(tag)][2] if paid else 0.0, round(rng.uniform(5, 60), 1),
+        "SUCCESS" if paid else "FAILED", not paid and rng.random() < 0.3,
+        tag_id(tag), plaza_id(rng.randrange(args.plazas))
+    )
+
+
+def gen_notification(args, rng, i):
+    notif_type, priority, message = rng.choice(NOTIFICATION_TYPES)
+    vehicle = rng.randrange(args.vehicles)
+    plaza = plaza_id(rng.randrange(args.plazas))
+    return (
+        stable_uuid(args.seed, "notification", i), f"{message} at plaza {plaza}",
+        random_moment(rng, args.history_start, args.history_seconds), notif_type, priority,
+        "read" if rng.random() < 0.7 else "unread", stable_uuid(args.seed, "vehicle", vehicle), plaza
+    )
+
+
+def gen_ledger(args, rng, i):
+    tag = rng.randrange(args.tags)
+    return (
+        stable_uuid(args.seed, "ledger", i), stable_uuid(args.seed, "vehicle", tag), tag_id(tag),
+        plaza_id(rng.randrange(args.plazas)), VEHICLE_TYPES[vehicle_type_index(tag)][2],
+        random_moment(rng, args.history_start, args.history_seconds), rng.random() < 0.8
+    )
+
+
+def gen_blacklisted(args, rng, i):
+    return (tag_id(rng.randrange(args.tags)), rng.choice(["Cloned tag", "Reported lost", "Fraud"]),
+            args.today - timedelta(days=rng.randint(0, 365)), "System", rng.choice(["LOW", "MEDIUM", "HIGH"]))
+
+
+def gen_stolen(args, rng, i):
+    vehicle = rng.randrange(args.vehicles)
+    return (license_plate(vehicle), stable_uuid(args.seed, "vehicle", vehicle),
+            args.today - timedelta(days=rng.randint(0, 365)), rng.choice(["Polizei Berlin", "LKA Bayern", "BKA"]),
+            rng.random() < 0.9)
+
+
+GENERATORS = {
+    "owners": (gen_owner, "owners"),
+    "accounts": (gen_account, "owners"),
+    "vehicles": (gen_vehicle, "vehicles"),
+    "rfid_tags": (gen_tag, "tags"),
+    "toll_transactions": (gen_transaction, "transactions"),
+    "notification": (gen_notification, "notifications"),
+    "pending_toll_ledger": (gen_ledger, "ledger"),
+    "blacklisted_rfid": (gen_blacklisted, "blacklisted"),
+    "stolen_vehicle_registry": (gen_stolen, "stolen"),
+}
+
+
+# ---- worker side ----
+
+_worker = {}
+
+
+def init_worker(db_config, args):
+    conn = connect(db_config)
+    conn.autocommit = False
+    with conn.cursor() as cur:
+        # Bulk load: losing the tail of a crashed run is fine, waiting on WAL flushes is not
+        cur.execute("SET synchronous_commit TO OFF")
+    conn.commit()
+    _worker["conn"], _worker["args"] = conn, args
+
+
+def copy_chunk(task):
+    table, chunk, start, end = task
+    args, conn = _worker["args"], _worker["conn"]
+    generate = GENERATORS[table][0]
+    rng = random.Random(f"{args.seed}:{table}:{chunk}")
+
+    buffer = io.StringIO()
+    for i in range(start, end):
+        buffer.write("\t".join(copy_value(v) for v in generate(args, rng, i)))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    with conn.cursor() as cur:
+        cur.copy_expert(f"COPY {table} ({TABLE_COLUMNS[table]}) FROM STDIN", buffer)
+    conn.commit()
+    return table, end - start
+
+
+# ---- coordinator ----
+
+def seed_reference_tables(cur, args):
+    cur.executemany("""
+        INSERT INTO lov_vehicle_types (type_code, description, base_cost)
+        VALUES (%s, %s, %s)
+        ON CONFLICT DO NOTHING
+    """, VEHICLE_TYPES)
+    cur.executemany("""
+        INSERT INTO lov_fines (fine_code, description, fine_amount)
+        VALUES (%s, %s, %s)
+        ON CONFLICT DO NOTHING
+    """, FINES)
+    rng = random.Random(f"{args.seed}:plazas")
+    cur.executemany("""
+        INSERT INTO toll_plazas (plaza_id, location, highway, is_operational, security_level)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT DO NOTHING
+    """, [(plaza_id(i), f"{rng.choice(CITIES)} {rng.choice(['North', 'South', 'East', 'West'])}",
+           f"A{rng.randint(1, 99)}", True, rng.choice(["LOW", "MEDIUM", "HIGH"]))
+          for i in range(args.plazas)])
+
+
+def truncate_tables(cur):
+    cur.execute("""
+        TRUNCATE toll_transactions, pending_toll_ledger, notification, blacklisted_rfid,
+                 stolen_vehicle_registry, rfid_tags, vehicles, accounts, owners
+    """)
+
+
+def chunk_tasks(table, count, chunk_size):
+    return [(table, n, start, min(start + chunk_size, count))
+            for n, start in enumerate(range(0, count, chunk_size))]
+
+
+def run(args):
+    db_config = load_db_config(args.config)
+    conn = connect(db_config)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        if args.truncate:
+            truncate_tables(cur)
+        seed_reference_tables(cur, args)
+
+    started = time.monotonic()
+    with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(db_config, args)) as pool:
+        for phase in PHASES:
+            tasks = []
+            for table in phase:
+                count = getattr(args, GENERATORS[table][1])
+                tasks.extend(chunk_tasks(table, count, args.chunk_size))
+            done = dict.fromkeys(phase, 0)
+            for table, rows in pool.imap_unordered(copy_chunk, tasks):
+                done[table] += rows
+                elapsed = time.monotonic() - started
+                print(f"\r[{elapsed:8.1f}s] " + "  ".join(f"{t}: {n:,}" for t, n in done.items()),
+                      end="", flush=True)
+            print()
+
+    if args.analyze:
+        with conn.cursor() as cur:
+            for table in TABLE_COLUMNS:
+                cur.execute(f"ANALYZE {table}")
+    conn.close()
+    print(f"Done in {time.monotonic() - started:.1f}s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate large synthetic ANPR datasets via COPY")
+    parser.add_argument("--config", default="configs/config.json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--owners", type=int, default=None, help="default: 80%% of --vehicles")
+    parser.add_argument("--vehicles", type=int, default=100000)
+    parser.add_argument("--tags", type=int, default=None, help="default: 80%% of --vehicles")
+    parser.add_argument("--plazas", type=int, default=50)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--notifications", type=int, default=100000)
+    parser.add_argument("--ledger", type=int, default=50000)
+    parser.add_argument("--blacklisted", type=int, default=None, help="default: 0.1%% of --tags")
+    parser.add_argument("--stolen", type=int, default=None, help="default: 0.05%% of --vehicles")
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--low-balance-ratio", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--truncate", action="store_true", help="empty the generated tables first")
+    parser.add_argument("--no-analyze", dest="analyze", action="store_false")
+    args = parser.parse_args()
+
+    args.owners = args.owners or max(int(args.vehicles * 0.8), 1)
+    args.tags = min(args.tags if args.tags is not None else int(args.vehicles * 0.8), args.vehicles)
+    args.blacklisted = args.blacklisted if args.blacklisted is not None else args.tags // 1000
+    args.stolen = args.stolen if args.stolen is not None else args.vehicles // 2000
+    if args.tags == 0:
+        args.transactions = args.ledger = args.blacklisted = 0
+
+    # Fixed reference point, so reruns with the same seed are identical
+    args.today = date(2025, 1, 1)
+    args.history_start = datetime(2025, 1, 1) - timedelta(days=args.history_days)
+    args.history_seconds = args.history_days * 86400
+    return args
+
+
+if __name__ == "__main__":
+    run(parse_args())
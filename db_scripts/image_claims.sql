@@ -0,0 +1,47 @@
+-- ========================
+-- captured_images work claiming
+-- ========================
+
+-- Lease columns for ImageProcessor (modules/all_in_one_module.py): a worker claims
+-- frames with FOR UPDATE SKIP LOCKED, sets processing_status = 'processing' and owns
+-- them until lease_expires_at; expired leases are reclaimed by any other worker, and
+-- frames that expired IMAGE_MAX_CLAIM_ATTEMPTS times are marked failed.
+ALTER TABLE captured_images ADD COLUMN IF NOT EXISTS claimed_by VARCHAR;
+ALTER TABLE captured_images ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+ALTER TABLE captured_images ADD COLUMN IF NOT EXISTS claim_attempts INTEGER NOT NULL DEFAULT 0;
+
+-- The claim scan: oldest pending frames first
+CREATE INDEX IF NOT EXISTS idx_captured_images_pending
+ON captured_images(capture_timestamp)
+WHERE processing_status = 'pending';
+
+-- Reclaiming crashed workers' frames
+CREATE INDEX IF NOT EXISTS idx_captured_images_lease
+ON captured_images(lease_expires_at)
+WHERE processing_status = 'processing';
+
+-- ========================
+-- Near-duplicate frame suppression
+-- ========================
+
+-- Frames whose perceptual hash matched a recent frame of the same camera are not sent
+-- through ANPR; they are stored as processing_status = 'duplicate' pointing at the
+-- frame that was (duplicate_of). When that frame's ANPR fails its duplicates are set
+-- back to 'pending' so the next frame of the burst gets read.
+-- frame_hash is the dHash in hex (512 bits with the default 16x16 grid).
+ALTER TABLE captured_images ADD COLUMN IF NOT EXISTS duplicate_of VARCHAR;
+ALTER TABLE captured_images ADD COLUMN IF NOT EXISTS frame_hash VARCHAR(128);
+DO $$
+BEGIN
+    -- Earlier revisions stored a 64-bit hash as BIGINT
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'captured_images' AND column_name = 'frame_hash' AND data_type = 'bigint'
+    ) THEN
+        ALTER TABLE captured_images ALTER COLUMN frame_hash TYPE VARCHAR(128) USING to_hex(frame_hash);
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_captured_images_duplicate_of
+ON captured_images(duplicate_of)
+WHERE duplicate_of IS NOT NULL;
@@ -0,0 +1,17 @@
+-- ========================
+-- Notification de-duplication
+-- ========================
+
+-- One row per (fingerprint, time bucket). create_notification claims the pair with
+-- INSERT ... ON CONFLICT DO NOTHING and only inserts the notification when the claim
+-- succeeded, replacing the message/type/priority scan over notification.
+-- bucket = epoch seconds / dedup window (configs/system.ini [NOTIFICATIONS]).
+CREATE TABLE IF NOT EXISTS notification_fingerprints (
+    fingerprint CHAR(40) NOT NULL,
+    bucket BIGINT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (fingerprint, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_fingerprints_created_at
+ON notification_fingerprints(created_at);
@@ -0,0 +1,17 @@
+-- ========================
+-- Notification pagination
+-- ========================
+
+-- Keyset pages per vehicle: GET /notifications/ reads
+--   WHERE vehicle_id = ? AND (timestamp, notification_id) < (cursor) ORDER BY timestamp DESC, notification_id DESC
+-- straight off this index. notification_id breaks timestamp ties so pages never overlap.
+-- Replaces idx_notification_vehicle_ts from partitioning.sql, which it covers.
+CREATE INDEX IF NOT EXISTS idx_notification_vehicle_page
+ON notification(vehicle_id, timestamp DESC, notification_id DESC);
+
+DROP INDEX IF EXISTS idx_notification_vehicle_ts;
+
+-- Unread summary: only unread rows are indexed, so the capped count stays small
+CREATE INDEX IF NOT EXISTS idx_notification_vehicle_unread
+ON notification(vehicle_id, timestamp)
+WHERE status = 'unread';
@@ -0,0 +1,93 @@
+-- ========================
+-- Time partitioning: toll_transactions and notification
+-- ========================
+
+-- Both tables become RANGE partitioned on timestamp, one partition per month named
+-- <table>_pYYYYMMDD (the first day of the range). modules/partitions.py relies on that
+-- naming: it creates the upcoming partitions and detaches / drops expired ones
+-- ([PARTITIONS] in configs/system.ini). For weekly or daily partitions change the
+-- step below and [PARTITIONS] interval together.
+-- The primary key has to include the partition key, hence (id, timestamp).
+-- Run once, in a maintenance window; existing rows are copied into the partitions and
+-- the old heaps are kept as *_legacy until you drop them. Keep [PARTITIONS] enabled
+-- afterwards (the default): only three months ahead are created here.
+
+BEGIN;
+
+-- ---- toll_transactions ----
+ALTER TABLE toll_transactions RENAME TO toll_transactions_legacy;
+
+CREATE TABLE toll_transactions (
+    transaction_id VARCHAR NOT NULL,
+    timestamp TIMESTAMPTZ NOT NULL,
+    amount DOUBLE PRECISION,
+    distance DOUBLE PRECISION,
+    status VARCHAR,
+    security_flag BOOLEAN DEFAULT FALSE,
+    rfid_tag_id VARCHAR REFERENCES rfid_tags(tag_id),
+    plaza_id VARCHAR REFERENCES toll_plazas(plaza_id),
+    PRIMARY KEY (transaction_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE INDEX idx_toll_transactions_tag_ts ON toll_transactions(rfid_tag_id, timestamp);
+CREATE INDEX idx_toll_transactions_plaza_ts ON toll_transactions(plaza_id, timestamp);
+
+-- ---- notification ----
+ALTER TABLE notification RENAME TO notification_legacy;
+
+CREATE TABLE notification (
+    notification_id UUID NOT NULL DEFAULT gen_random_uuid(),
+    message TEXT NOT NULL,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    type VARCHAR NOT NULL,
+    priority VARCHAR NOT NULL,
+    vehicle_id UUID,
+    plaza_id VARCHAR,
+    status VARCHAR DEFAULT 'unread',
+    PRIMARY KEY (notification_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE INDEX idx_notification_vehicle_ts ON notification(vehicle_id, timestamp DESC);
+CREATE INDEX idx_notification_type_ts ON notification(type, timestamp);
+
+-- ---- partitions for the existing data plus three months ahead ----
+DO $$
+DECLARE
+    tbl TEXT;
+    first_ts TIMESTAMPTZ;
+    start_day DATE;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['toll_transactions', 'notification'] LOOP
+        EXECUTE format('SELECT MIN(timestamp) FROM %I', tbl || '_legacy') INTO first_ts;
+        start_day := date_trunc('month', COALESCE(first_ts, NOW()))::date;
+        WHILE start_day < date_trunc('month', NOW())::date + INTERVAL '4 months' LOOP
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                tbl || '_p' || to_char(start_day, 'YYYYMMDD'), tbl,
+                start_day, (start_day + INTERVAL '1 month')::date
+            );
+            start_day := (start_day + INTERVAL '1 month')::date;
+        END LOOP;
+        -- Catches rows outside every range (late replays, clock skew, maintenance
+        -- falling behind) instead of failing the insert; maintenance moves them into
+        -- their partition once it is created
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', tbl || '_default', tbl);
+    END LOOP;
+END $$;
+
+INSERT INTO toll_transactions
+SELECT transaction_id, timestamp, amount, distance, status, security_flag, rfid_tag_id, plaza_id
+FROM toll_transactions_legacy;
+
+INSERT INTO notification
+SELECT notification_id, message, COALESCE(timestamp, NOW()), type, priority, vehicle_id, plaza_id, status
+FROM notification_legacy;
+
+COMMIT;
+
+ANALYZE toll_transactions;
+ANALYZE notification;
+
+-- Once verified:
+-- DROP TABLE toll_transactions_legacy;
+-- DROP TABLE notification_legacy;
@@ -0,0 +1,10 @@
+-- ========================
+-- Pending toll settlement
+-- ========================
+
+-- Unpaid ledger rows of a vehicle, oldest first: the running-sum scan behind account
+-- top-up and the nightly bulk settlement (modules/settlement.py) and the
+-- "already pending" check of record_pending_toll.
+CREATE INDEX IF NOT EXISTS idx_pending_toll_ledger_unresolved
+ON pending_toll_ledger(vehicle_id, created_at, ledger_id)
+WHERE resolved = FALSE;
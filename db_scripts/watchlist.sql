@@ -0,0 +1,54 @@
+-- ========================
+-- Security watchlist support
+-- ========================
+
+-- Lookups by plate / tag were sequential scans
+CREATE INDEX IF NOT EXISTS idx_stolen_registry_plate
+ON stolen_vehicle_registry(licensePlate) WHERE status = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_blacklisted_rfid_tag_id
+ON blacklisted_rfid(tag_id);
+
+
+-- Push every row change to the in-memory watchlist (modules/watchlist.py)
+CREATE OR REPLACE FUNCTION notify_watchlist_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'watchlist_changes',
+        json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', TG_OP,
+            'row', row_to_json(CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END)
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_blacklisted_rfid_watchlist ON blacklisted_rfid;
+CREATE TRIGGER trg_blacklisted_rfid_watchlist
+AFTER INSERT OR UPDATE OR DELETE ON blacklisted_rfid
+FOR EACH ROW EXECUTE FUNCTION notify_watchlist_change();
+
+DROP TRIGGER IF EXISTS trg_stolen_registry_watchlist ON stolen_vehicle_registry;
+CREATE TRIGGER trg_stolen_registry_watchlist
+AFTER INSERT OR UPDATE OR DELETE ON stolen_vehicle_registry
+FOR EACH ROW EXECUTE FUNCTION notify_watchlist_change();
+
+-- Cached toll passages (modules/resolution_cache.py) hold the resolved vehicle, active
+-- tag and account; drop them as soon as any of those rows changes. Only the columns the
+-- resolution reads are watched, so balance updates notify nothing.
+DROP TRIGGER IF EXISTS trg_rfid_tags_resolution ON rfid_tags;
+CREATE TRIGGER trg_rfid_tags_resolution
+AFTER INSERT OR UPDATE OF is_active, vehicle_id OR DELETE ON rfid_tags
+FOR EACH ROW EXECUTE FUNCTION notify_watchlist_change();
+
+DROP TRIGGER IF EXISTS trg_vehicles_resolution ON vehicles;
+CREATE TRIGGER trg_vehicles_resolution
+AFTER UPDATE OF license_plate, owner_id, vehicle_type OR DELETE ON vehicles
+FOR EACH ROW EXECUTE FUNCTION notify_watchlist_change();
+
+DROP TRIGGER IF EXISTS trg_accounts_resolution ON accounts;
+CREATE TRIGGER trg_accounts_resolution
+AFTER INSERT OR UPDATE OF is_active, owner_id OR DELETE ON accounts
+FOR EACH ROW EXECUTE FUNCTION notify_watchlist_change();
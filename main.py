@@ -1,9 +1,24 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from api.vehicle_routes import router as vehicle_router
 from api.rfid_routes import router as rfid_router
 from api.notification_routes import router as notif_router
 from api.security_routes import router as security_router
 from api.toll_routes import router as toll_router
+from api.admin_routes import router as admin_router
+from api.account_routes import router as account_router
+from api.event_routes import router as event_router
+from modules.db_pool import get_pool, close_pool
+from modules.reference_cache import reference_cache
+from modules.watchlist import watchlist, watchlist_listen
+from modules.logger import alert_logger, shutdown_logging, logging_stats
+from modules.resolution_cache import resolution_cache
+from modules.notification import recent_fingerprints
+from modules.metrics import render_metrics
+from modules.profiler import install_profiler, profiler
+from modules.group_commit import group_commit
+from modules.event_bus import event_bus
+from modules.partitions import partition_maintenance, partition_maintenance_enabled
 
 
 
@@ -15,7 +30,55 @@ app.include_router(rfid_router, prefix="/rfid", tags=["RFID"])
 app.include_router(notif_router, prefix="/notifications", tags=["Notifications"])
 app.include_router(security_router, prefix="/security", tags=["Security"])
 app.include_router(toll_router, prefix="/toll", tags=["Toll"])
+app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+app.include_router(account_router, prefix="/account", tags=["Account"])
+app.include_router(event_router, prefix="/events", tags=["Events"])
+install_profiler(app)
+
+
+@app.on_event("startup")
+def warm_up():
+    profiler.register_routes(app.routes)
+    get_pool()
+    reference_cache.refresh()
+    watchlist.refresh()
+    if watchlist_listen:
+        watchlist.start_listener()
+    if partition_maintenance_enabled:
+        partition_maintenance.start_scheduler()
+    elif partition_maintenance.partitioned_tables():
+        # Nothing else creates next month's partitions; inserts fall into the DEFAULT one
+        alert_logger.error("Tables are partitioned but [PARTITIONS] enabled = false; "
+                           "run python -m modules.partitions from cron")
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    group_commit.close()
+    close_pool()
+    shutdown_logging()
+
 
 @app.get("/")
 def root():
     return {"message": "ANPR API is running"}
+
+
+@app.get("/health")
+def health():
+    return {"status": "OK", "db_pool": get_pool().stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render_metrics([
+        ("anpr_db_pool", "Database connection pool", get_pool().stats()),
+        ("anpr_reference_cache", "Plaza and rate cache", reference_cache.stats()),
+        ("anpr_watchlist", "Stolen / blacklist watchlist", watchlist.stats()),
+        ("anpr_resolution_cache", "Vehicle and tag resolution cache", resolution_cache.stats()),
+        ("anpr_notification_fingerprints", "Recent notification fingerprints", recent_fingerprints.stats),
+        ("anpr_logging", "Queue logging backend", logging_stats()),
+        ("anpr_group_commit", "Toll transaction group commit writer", group_commit.stats()),
+        ("anpr_event_bus", "Notification / security event stream", event_bus.stats()),
+        ("anpr_partitions", "Partition maintenance", partition_maintenance.stats()),
+    ])
@@ -1,18 +1,8 @@
-import psycopg2, json
 from modules.logger import alert_logger
-
-
-with open("configs/config.json") as f:
-    db_config = json.load(f)
-
-def get_connection():
-    return psycopg2.connect(
-        dbname=db_config["database"],
-        user=db_config["user"],
-        password=db_config["password"],
-        host=db_config["host"],
-        port=db_config["port"]
-    )
+from modules.watchlist import watchlist
+from modules.metrics import instrumented
+from modules.db_pool import after_commit
+from modules.event_bus import event_bus
 
 
 def is_blacklisted_rfid(cur, tag_id):
@@ -35,32 +25,54 @@ def generate_alert(cur, alert_type, message, priority):
     cur.execute("""
         INSERT INTO notification (notification_id, message, timestamp, type, priority)
         VALUES (gen_random_uuid(), %s, NOW(), %s, %s)
+        RETURNING notification_id, timestamp
     """, (message, alert_type, priority))
+    notification_id, timestamp = cur.fetchone()
+    after_commit(cur.connection, lambda: event_bus.publish("notification", {
+        "notification_id": notification_id, "timestamp": timestamp, "message": message,
+        "vehicle_id": None, "status": "unread",
+    }, event_type=alert_type, priority=priority))
     alert_logger.info(f"ALERT [{alert_type}] | {message}")
 
 
-def run_security_checks(cur, license_plate, tag_id):
-    # 1. Check stolen vehicle
-    stolen = is_stolen_vehicle(cur, license_plate)
+def classify_security(license_plate, tag_id, stolen, blacklisted):
+    """
+        Turn stolen / blacklist lookups into (status dict, alert), where alert is the
+        (alert_type, message, priority) to raise, or None for a clear vehicle.
+    """
+    # 1. Stolen vehicle
     if stolen:
-        generate_alert(
-            cur,
+        return {"status": "STOLEN", "details": stolen}, (
             "STOLEN_VEHICLE",
             f"Stolen vehicle detected: {license_plate}",
             "CRITICAL"
         )
-        return {"status": "STOLEN", "details": stolen}
 
-    # 2. Check blacklisted RFID
-    blacklisted = is_blacklisted_rfid(cur, tag_id)
+    # 2. Blacklisted RFID
     if blacklisted:
         reason, severity = blacklisted
-        generate_alert(
-            cur,
+        return {"status": "BLACKLISTED", "reason": reason}, (
             "BLACKLISTED_TAG",
             f"Blacklisted RFID {tag_id} used. Reason: {reason}",
             severity
         )
-        return {"status": "BLACKLISTED", "reason": reason}
 
-    return {"status": "CLEAR"}
+    return {"status": "CLEAR"}, None
+
+
+def security_verdict(cur, license_plate, tag_id, stolen, blacklisted):
+    """
+        Turn stolen / blacklist lookups into a status dict, raising the matching alert.
+    """
+    verdict, alert = classify_security(license_plate, tag_id, stolen, blacklisted)
+    if alert:
+        generate_alert(cur, *alert)
+    return verdict
+
+
+@instrumented("security_checks")
+def run_security_checks(cur, license_plate, tag_id):
+    # Answered from the in-memory watchlist; only flagged vehicles cause writes
+    stolen = watchlist.stolen_vehicle(license_plate, cur)
+    blacklisted = None if stolen else watchlist.blacklisted_tag(tag_id, cur)
+    return security_verdict(cur, license_plate, tag_id, stolen, blacklisted)
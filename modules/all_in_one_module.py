@@ -5,6 +5,12 @@
 import asyncio
 import logging
 import json
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
@@ -15,6 +21,8 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 import redis
 
+from modules.plate_fusion import PlateFusion
+
 # =============================================
 # CONFIGURATION AND CONSTANTS
 # =============================================
@@ -29,6 +37,21 @@ class SystemConfig:
     MAX_TRANSACTION_RETRY = 3
     ANPR_CONFIDENCE_THRESHOLD = 85.0
     DEFAULT_TOLL_RATE = 5.50
+    IMAGE_WORKERS = os.cpu_count() or 1  # processes decoding / analysing frames
+    IMAGE_MAX_IN_FLIGHT = 2 * (os.cpu_count() or 1)  # frames submitted but not finished
+    IMAGE_BATCH_SIZE = 50  # pending frames claimed per poll
+    IMAGE_LEASE_SECONDS = 120  # a claim not finished by then is handed to another worker
+    IMAGE_MAX_CLAIM_ATTEMPTS = 3  # frames whose lease expired this often are marked failed
+    QUALITY_BATCH_CHUNK = 32  # frames per vectorized pass
+    FRAME_DEDUP_ENABLED = True  # drop near-duplicate frames of a camera before ANPR
+    FRAME_DEDUP_WINDOW_SECONDS = 2.0  # capture-time window a frame is compared against
+    FRAME_DEDUP_HASH_SIZE = 16  # dHash grid side; 16 gives 2 x 256 bits
+    FRAME_DEDUP_MIN_GRADIENT = 8  # grey levels a neighbour step needs to set a bit (flat areas set none)
+    FRAME_DEDUP_MAX_DISTANCE = 4  # max differing bits of the dHash to count as duplicate
+    FRAME_DEDUP_MAX_PER_CAMERA = 32  # recent hashes remembered per camera
+    PLATE_FUSION_WINDOW_SECONDS = 1.5  # reads of one lane this close together are one vehicle
+    PLATE_FUSION_MAX_CHAR_DIFF = 2  # max edits between a read and the vehicle's consensus
+    CAMERA_LANES = {}  # camera_id -> (plaza/gantry id, lane id); unmapped cameras are their own lane
 
 class ImageQuality(Enum):
     HQ = "HQ"
@@ -65,17 +88,234 @@ class DatabaseManager:
         with self.get_session() as session:
             return session.execute(text(query), params or {})
 
+    def execute_write(self, query: str, params: dict = None) -> List[Dict]:
+        """Run a statement in its own committed transaction, returning any rows as dicts"""
+        with self.get_session() as session:
+            result = session.execute(text(query), params or {})
+            rows = [dict(row) for row in result.mappings()] if result.returns_rows else []
+            session.commit()
+            return rows
+
 # =============================================
 # IMAGE PROCESSING MODULE
 # =============================================
 
+def init_image_worker():
+    """Process pool initializer: one OpenCV thread per worker, own random state."""
+    cv2.setNumThreads(1)
+    np.random.seed()
+
+
+def assess_image_quality(image) -> ImageQuality:
+    """Assess image quality based on various metrics"""
+    # Calculate image sharpness using Laplacian variance
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+
+    # Calculate brightness
+    brightness = np.mean(gray)
+
+    # Determine quality based on metrics
+    if laplacian_var > 500 and 50 <= brightness <= 200:
+        return ImageQuality.HQ
+    elif laplacian_var > 100:
+        return ImageQuality.LQ
+    else:
+        return ImageQuality.POOR
+
+
+def quality_metrics_batch(frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sharpness (Laplacian variance), brightness (mean) and contrast (standard deviation)
+    of a stack of same-sized frames, shape (N, H, W, 3) BGR or (N, H, W) grayscale.
+    Each QUALITY_BATCH_CHUNK frames are viewed as one tall image, so grayscale
+    conversion and the Laplacian run as a single OpenCV call per chunk (int16 output
+    instead of float64); only the rows where neighbouring frames touch are corrected
+    back to the per-frame reflect-101 border, in one vectorized step.
+    """
+    count, height, width = frames.shape[:3]
+    sharpness = np.empty(count, dtype=np.float64)
+    brightness = np.empty(count, dtype=np.float64)
+    contrast = np.empty(count, dtype=np.float64)
+    chunk = SystemConfig.QUALITY_BATCH_CHUNK
+
+    for start in range(0, count, chunk):
+        block = np.ascontiguousarray(frames[start:start + chunk])
+        n = len(block)
+        if block.ndim == 4:
+            gray = cv2.cvtColor(block.reshape(n * height, width, 3), cv2.COLOR_BGR2GRAY)
+        else:
+            gray = block.reshape(n * height, width)
+        laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+
+        if n > 1 and height > 1:
+            g = gray.reshape(n, height, width)
+            lap = laplacian.reshape(n, height, width)
+            first, second = g[:, 0].astype(np.int16), g[:, 1].astype(np.int16)
+            last, before_last = g[:, -1].astype(np.int16), g[:, -2].astype(np.int16)
+            # Top row of frames 1..n-1 saw the previous frame's last row instead of row 1,
+            # bottom row of frames 0..n-2 saw the next frame's first row instead of row H-2
+            lap[1:, 0] += second[1:] - last[:-1]
+            lap[:-1, -1] += before_last[:-1] - first[1:]
+
+        for i in range(n):
+            rows = slice(i * height, (i + 1) * height)
+            mean, std = cv2.meanStdDev(gray[rows])
+            brightness[start + i], contrast[start + i] = mean[0, 0], std[0, 0]
+            sharpness[start + i] = cv2.meanStdDev(laplacian[rows])[1][0, 0] ** 2
+
+    return sharpness, brightness, contrast
+
+
+def assess_image_quality_batch(frames: np.ndarray) -> List[ImageQuality]:
+    """
+    assess_image_quality for a whole stack of frames (or downscaled plate crops; note
+    that downscaling raises Laplacian variance, so crops classify against the same
+    thresholds only if they keep the capture resolution).
+    """
+    sharpness, brightness, _ = quality_metrics_batch(frames)
+    hq = (sharpness > 500) & (brightness >= 50) & (brightness <= 200)
+    lq = ~hq & (sharpness > 100)
+    classes = np.where(hq, 0, np.where(lq, 1, 2))
+    ordered = (ImageQuality.HQ, ImageQuality.LQ, ImageQuality.POOR)
+    return [ordered[c] for c in classes]
+
+
+def run_anpr(image, quality: ImageQuality) -> Tuple[Optional[str], float]:
+    """Perform Automatic Number Plate Recognition"""
+    # Placeholder for ANPR implementation
+    # In production, integrate with OpenALPR, EasyOCR, or custom ML model
+
+    # Simulate ANPR processing based on image quality
+    if quality == ImageQuality.HQ:
+        # High quality images have better detection rates
+        confidence = np.random.uniform(85, 98)
+        # Simulate detected plate (in production, this would be actual ANPR)
+        detected_plate = f"ABC{np.random.randint(1000, 9999)}"
+    elif quality == ImageQuality.LQ:
+        confidence = np.random.uniform(70, 85)
+        detected_plate = f"XYZ{np.random.randint(1000, 9999)}" if confidence > 75 else None
+    else:
+        confidence = np.random.uniform(0, 40)
+        detected_plate = None
+
+    return detected_plate, float(confidence)
+
+
+def analyze_image(image_path: str) -> Optional[Tuple[Optional[str], float, ImageQuality]]:
+    """
+    Decode, quality-check and read one frame. Runs inside the process pool, so only
+    the path goes in and only the small result comes back, never the pixels.
+    Returns None when the image cannot be decoded.
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    quality = assess_image_quality(image)
+    detected_plate, confidence = run_anpr(image, quality)
+    return detected_plate, confidence, quality
+
+
+def frame_hash(image_path: str, hash_size: int = SystemConfig.FRAME_DEDUP_HASH_SIZE,
+               min_gradient: int = SystemConfig.FRAME_DEDUP_MIN_GRADIENT) -> Optional[int]:
+    """
+    Difference hash (dHash) of a frame on a hash_size grid, computed in the process pool.
+    Each neighbour step sets one bit when it rises by more than min_gradient and another
+    when it falls by more, so flat road and sky contribute no bits that sensor noise
+    could flip, and a different vehicle in the same framing differs by many bits where
+    a 9x8 sign-only hash barely changes. The JPEG is decoded at 1/8 scale in grayscale,
+    a fraction of a full decode. Returns None when the image cannot be decoded.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if image is None:
+        return None
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    steps = small[:, 1:] - small[:, :-1]
+    bits = np.concatenate([(steps > min_gradient).flatten(), (steps < -min_gradient).flatten()])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class FrameDeduplicator:
+    """
+    Per-camera window of recent frame hashes. A frame whose dHash is within max_distance
+    bits of a frame the same camera captured less than window_seconds earlier (or later)
+    is reported as a duplicate of that frame, so the burst a lane camera fires for one
+    vehicle costs a single ANPR run. A kept frame whose ANPR fails is forgotten, so its
+    duplicates can be re-queued and the next one gets its own run. Runs on the event
+    loop, so no locking is needed.
+    """
+
+    def __init__(self, window_seconds: float = SystemConfig.FRAME_DEDUP_WINDOW_SECONDS,
+                 max_distance: int = SystemConfig.FRAME_DEDUP_MAX_DISTANCE,
+                 max_per_camera: int = SystemConfig.FRAME_DEDUP_MAX_PER_CAMERA):
+        self.window_seconds = window_seconds
+        self.max_distance = max_distance
+        self.max_per_camera = max_per_camera
+        self.recent: Dict[str, deque] = {}
+        self.failed = deque(maxlen=1024)  # kept frames whose ANPR failed, newest last
+        self.stats = {'hashed': 0, 'kept': 0, 'suppressed': 0, 'released': 0}
+
+    def check(self, camera_id: str, captured_at: datetime, image_id: str, frame_hash: int) -> Optional[str]:
+        """image_id of the frame this one duplicates, or None (and remember it) if it is new"""
+        self.stats['hashed'] += 1
+        when = captured_at.timestamp()
+        window = self.recent.setdefault(camera_id, deque(maxlen=self.max_per_camera))
+        for seen_at, seen_hash, seen_id in window:
+            if abs(when - seen_at) <= self.window_seconds and \
+                    (frame_hash ^ seen_hash).bit_count() <= self.max_distance:
+                self.stats['suppressed'] += 1
+                return seen_id
+        window.append((when, frame_hash, image_id))
+        self.stats['kept'] += 1
+        return None
+
+    def release(self, camera_id: str, image_id: str):
+        """Forget a kept frame whose ANPR failed; later frames no longer match it"""
+        window = self.recent.get(camera_id)
+        if window is not None:
+            for entry in list(window):
+                if entry[2] == image_id:
+                    window.remove(entry)
+        self.failed.append(image_id)
+        self.stats['released'] += 1
+
+    def was_released(self, image_id: str) -> bool:
+        return image_id in self.failed
+
+
 class ImageProcessor:
     """Handles image capture, processing, and ANPR"""
     
-    def __init__(self, db_manager: DatabaseManager, redis_client):
+    def __init__(self, db_manager: DatabaseManager, redis_client,
+                 workers: int = SystemConfig.IMAGE_WORKERS,
+                 max_in_flight: int = SystemConfig.IMAGE_MAX_IN_FLIGHT):
         self.db_manager = db_manager
         self.redis_client = redis_client
         self.logger = logging.getLogger(__name__)
+        # CPU-bound decode / quality / ANPR work runs in worker processes so it neither
+        # blocks the event loop nor serialises on the GIL
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.pool = None
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        # Identifies this instance's leases in captured_images.claimed_by
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.deduplicator = FrameDeduplicator() if SystemConfig.FRAME_DEDUP_ENABLED else None
+        # Consolidates the reads of one vehicle into one plate event before any toll call
+        self.fusion = PlateFusion(
+            window_seconds=SystemConfig.PLATE_FUSION_WINDOW_SECONDS,
+            max_char_diff=SystemConfig.PLATE_FUSION_MAX_CHAR_DIFF
+        )
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_image_worker)
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
         
     async def process_image_queue(self):
         """Continuously process images from queue"""
@@ -84,115 +324,248 @@ class ImageProcessor:
                 # Get pending images from database
                 pending_images = await self.get_pending_images()
                 
+                # Keep at most max_in_flight frames in the pool; each result is handled
+                # as soon as it is ready
+                tasks = []
                 for image_data in pending_images:
-                    await self.process_single_image(image_data)
+                    await self.in_flight.acquire()
+                    task = asyncio.create_task(self.process_single_image(image_data))
+                    task.add_done_callback(lambda _: self.in_flight.release())
+                    tasks.append(task)
+                reads = [read for read in await asyncio.gather(*tasks) if read is not None]
+                
+                # Frames finish ANPR in any order; fusion needs each lane's reads in
+                # capture order, so the batch's plates are fed once all are back
+                for image_data, detected_plate, confidence in sorted(
+                        reads, key=lambda read: read[0]['capture_timestamp']):
+                    plaza_id, lane_id = SystemConfig.CAMERA_LANES.get(
+                        image_data['camera_id'], (None, image_data['camera_id'])
+                    )
+                    await self.emit_fused_plates(self.fusion.add(
+                        plaza_id, lane_id, detected_plate, confidence,
+                        image_data['capture_timestamp'].timestamp(), source=image_data
+                    ))
+                await self.emit_fused_plates(self.fusion.flush())
                     
-                await asyncio.sleep(SystemConfig.IMAGE_PROCESSING_INTERVAL)
+                # A full batch means there is a backlog: claim the next one right away
+                if len(pending_images) < SystemConfig.IMAGE_BATCH_SIZE:
+                    # Queue drained: vehicles idle for the fusion window by now are complete
+                    await self.emit_fused_plates(self.fusion.flush(datetime.now().timestamp()))
+                    await asyncio.sleep(SystemConfig.IMAGE_PROCESSING_INTERVAL)
                 
             except Exception as e:
                 self.logger.error(f"Image processing error: {e}")
                 await asyncio.sleep(10)
     
     async def get_pending_images(self) -> List[Dict]:
-        """Get images pending processing"""
+        """
+        Claim up to IMAGE_BATCH_SIZE frames for this worker: pending ones, plus frames
+        whose lease expired because their worker crashed. SKIP LOCKED lets any number
+        of workers on any number of machines claim concurrently without ever handing
+        out the same frame twice. Frames that keep losing their lease are failed
+        instead of being retried forever. Every database round trip of this class runs
+        in a thread, so the event loop keeps feeding the process pool meanwhile.
+        """
+        await asyncio.to_thread(self.db_manager.execute_write, """
+        UPDATE captured_images
+        SET processing_status = 'failed', claimed_by = NULL, lease_expires_at = NULL
+        WHERE processing_status = 'processing'
+          AND lease_expires_at < NOW()
+          AND claim_attempts >= :max_attempts
+        """, {'max_attempts': SystemConfig.IMAGE_MAX_CLAIM_ATTEMPTS})
+
         query = """
-        SELECT image_id, transaction_id, camera_id, image_path, capture_timestamp
-        FROM captured_images 
-        WHERE processing_status = 'pending'
-        ORDER BY capture_timestamp ASC
-        LIMIT 50
+        WITH claimable AS (
+            SELECT image_id
+            FROM captured_images
+            WHERE processing_status = 'pending'
+               OR (processing_status = 'processing' AND lease_expires_at < NOW())
+            ORDER BY capture_timestamp ASC
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE captured_images ci
+        SET processing_status = 'processing',
+            claimed_by = :worker_id,
+            lease_expires_at = NOW() + make_interval(secs => :lease_seconds),
+            claim_attempts = ci.claim_attempts + 1
+        FROM claimable c
+        WHERE ci.image_id = c.image_id
+        RETURNING ci.image_id, ci.transaction_id, ci.camera_id, ci.image_path, ci.capture_timestamp
         """
-        result = self.db_manager.execute_query(query)
-        return [dict(row) for row in result]
+        claimed = await asyncio.to_thread(self.db_manager.execute_write, query, {
+            'batch_size': SystemConfig.IMAGE_BATCH_SIZE,
+            'worker_id': self.worker_id,
+            'lease_seconds': SystemConfig.IMAGE_LEASE_SECONDS
+        })
+        # RETURNING order is arbitrary; keep processing oldest first
+        return sorted(claimed, key=lambda row: row['capture_timestamp'])
     
-    async def process_single_image(self, image_data: Dict):
-        """Process a single image for license plate detection"""
+    async def process_single_image(self, image_data: Dict) -> Optional[Tuple[Dict, str, float]]:
+        """
+        Process a single image for license plate detection. Returns (image_data, plate,
+        confidence) for a frame that read a plate, for plate fusion, otherwise None.
+        """
         try:
             image_path = image_data['image_path']
             image_id = image_data['image_id']
             
-            # Load and analyze image
-            image = cv2.imread(image_path)
-            if image is None:
-                await self.update_image_status(image_id, 'failed', 0.0, None)
-                return
+            loop = asyncio.get_running_loop()
             
-            # Determine image quality
-            quality = self.assess_image_quality(image)
+            # Cheap perceptual hash first: bursts of the same vehicle skip ANPR
+            if self.deduplicator is not None:
+                hashed = await loop.run_in_executor(self.get_pool(), frame_hash, image_path)
+                if hashed is None:
+                    await self.update_image_status(image_id, 'failed', 0.0, None)
+                    return
+                kept_id = self.deduplicator.check(
+                    image_data['camera_id'], image_data['capture_timestamp'], image_id, hashed
+                )
+                if kept_id is not None:
+                    await self.mark_duplicate(image_id, kept_id, hashed)
+                    # The kept frame may have failed while this one was being marked
+                    if self.deduplicator.was_released(kept_id):
+                        await self.requeue_duplicates(kept_id)
+                    return
             
-            # Perform ANPR
-            detected_plate, confidence = await self.perform_anpr(image, quality)
+            # Load and analyze image in the process pool
+            analysis = await loop.run_in_executor(self.get_pool(), analyze_image, image_path)
+            if analysis is None:
+                await self.update_image_status(image_id, 'failed', 0.0, None)
+                await self.release_duplicates(image_data)
+                return
+            detected_plate, confidence, quality = analysis
             
             # Update database with results
             await self.update_image_processing_result(
                 image_id, detected_plate, confidence, quality
             )
             
-            # If plate detected with high confidence, trigger transaction processing
-            if detected_plate and confidence >= SystemConfig.ANPR_CONFIDENCE_THRESHOLD:
-                await self.trigger_transaction_processing(image_data, detected_plate, confidence)
+            # A blurry kept frame must not take its clean neighbours down with it
+            if not detected_plate or confidence < SystemConfig.ANPR_CONFIDENCE_THRESHOLD:
+                await self.release_duplicates(image_data)
+            
+            # Every read goes to the lane's fusion track, weak ones still vote; transactions
+            # are triggered once per vehicle from the consolidated plate
+            if detected_plate:
+                return image_data, detected_plate, confidence
                 
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM on a corrupt frame); start a fresh pool next time
+            self.logger.error(f"Image worker pool broken while processing {image_data['image_id']}: {e}")
+            self.pool = None
+            await self.update_image_status(image_data['image_id'], 'failed', 0.0, None)
         except Exception as e:
             self.logger.error(f"Error processing image {image_data['image_id']}: {e}")
             await self.update_image_status(image_data['image_id'], 'failed', 0.0, None)
     
+    async def emit_fused_plates(self, fused_plates):
+        """Trigger transaction processing once per consolidated vehicle read"""
+        for fused in fused_plates:
+            if fused.confidence >= SystemConfig.ANPR_CONFIDENCE_THRESHOLD:
+                await self.trigger_transaction_processing(fused.best_source, fused.plate, fused.confidence)
+            else:
+                self.logger.info(f"Fused plate below threshold, left for manual review: {fused}")
+        if fused_plates:
+            self.logger.debug(f"Plate fusion: {self.fusion.stats}")
+    
     def assess_image_quality(self, image) -> ImageQuality:
         """Assess image quality based on various metrics"""
-        # Calculate image sharpness using Laplacian variance
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        
-        # Calculate brightness
-        brightness = np.mean(gray)
-        
-        # Determine quality based on metrics
-        if laplacian_var > 500 and 50 <= brightness <= 200:
-            return ImageQuality.HQ
-        elif laplacian_var > 100:
-            return ImageQuality.LQ
-        else:
-            return ImageQuality.POOR
+        return assess_image_quality(image)
     
     async def perform_anpr(self, image, quality: ImageQuality) -> Tuple[Optional[str], float]:
         """Perform Automatic Number Plate Recognition"""
-        # Placeholder for ANPR implementation
-        # In production, integrate with OpenALPR, EasyOCR, or custom ML model
-        
-        # Simulate ANPR processing based on image quality
-        if quality == ImageQuality.HQ:
-            # High quality images have better detection rates
-            confidence = np.random.uniform(85, 98)
-            # Simulate detected plate (in production, this would be actual ANPR)
-            detected_plate = f"ABC{np.random.randint(1000, 9999)}"
-        elif quality == ImageQuality.LQ:
-            confidence = np.random.uniform(70, 85)
-            detected_plate = f"XYZ{np.random.randint(1000, 9999)}" if confidence > 75 else None
-        else:
-            confidence = np.random.uniform(0, 40)
-            detected_plate = None
-            
-        return detected_plate, confidence
+        return run_anpr(image, quality)
     
     async def update_image_processing_result(self, image_id: str, detected_plate: str, 
                                            confidence: float, quality: ImageQuality):
         """Update image processing results in database"""
         status = 'processed' if detected_plate else 'manual_review'
         
+        # Only while we still hold the lease: once it expired the frame may belong to
+        # another worker, whose result wins
         query = """
         UPDATE captured_images 
         SET processing_status = :status,
             confidence_score = :confidence,
             detected_plate = :detected_plate,
-            image_quality = :quality
-        WHERE image_id = :image_id
+            image_quality = :quality,
+            claimed_by = NULL,
+            lease_expires_at = NULL
+        WHERE image_id = :image_id AND claimed_by = :worker_id
         """
         
-        self.db_manager.execute_query(query, {
+        await asyncio.to_thread(self.db_manager.execute_write, query, {
             'status': status,
             'confidence': confidence,
             'detected_plate': detected_plate,
             'quality': quality.value,
-            'image_id': image_id
+            'image_id': image_id,
+            'worker_id': self.worker_id
+        })
+    
+    async def mark_duplicate(self, image_id: str, kept_image_id: str, hashed: int):
+        """Merge a near-duplicate frame into the frame that goes through ANPR"""
+        query = """
+        UPDATE captured_images 
+        SET processing_status = 'duplicate',
+            duplicate_of = :kept_image_id,
+            frame_hash = :frame_hash,
+            claimed_by = NULL,
+            lease_expires_at = NULL
+        WHERE image_id = :image_id AND claimed_by = :worker_id
+        """
+        
+        await asyncio.to_thread(self.db_manager.execute_write, query, {
+            'kept_image_id': kept_image_id,
+            'frame_hash': format(hashed, 'x'),
+            'image_id': image_id,
+            'worker_id': self.worker_id
+        })
+        
+        suppressed = self.deduplicator.stats['suppressed']
+        if suppressed % 100 == 1:
+            self.logger.info(f"Frame dedup: {self.deduplicator.stats}")
+    
+    async def release_duplicates(self, image_data: Dict):
+        """The kept frame's ANPR failed: hand the frames merged into it back to the queue"""
+        if self.deduplicator is None:
+            return
+        self.deduplicator.release(image_data['camera_id'], image_data['image_id'])
+        await self.requeue_duplicates(image_data['image_id'])
+    
+    async def requeue_duplicates(self, kept_image_id: str):
+        query = """
+        UPDATE captured_images 
+        SET processing_status = 'pending',
+            duplicate_of = NULL
+        WHERE duplicate_of = :kept_image_id AND processing_status = 'duplicate'
+        RETURNING image_id
+        """
+        
+        requeued = await asyncio.to_thread(self.db_manager.execute_write, query, {'kept_image_id': kept_image_id})
+        if requeued:
+            self.logger.info(f"Re-queued {len(requeued)} duplicates of failed frame {kept_image_id}")
+    
+    async def update_image_status(self, image_id: str, status: str, confidence: float,
+                                  detected_plate: Optional[str]):
+        """Finish a claimed image without a quality result (e.g. it failed to decode)"""
+        query = """
+        UPDATE captured_images 
+        SET processing_status = :status,
+            confidence_score = :confidence,
+            detected_plate = :detected_plate,
+            claimed_by = NULL,
+            lease_expires_at = NULL
+        WHERE image_id = :image_id AND claimed_by = :worker_id
+        """
+        
+        await asyncio.to_thread(self.db_manager.execute_write, query, {
+            'status': status,
+            'confidence': confidence,
+            'detected_plate': detected_plate,
+            'image_id': image_id,
+            'worker_id': self.worker_id
         })
 
 # =============================================
@@ -698,7 +1071,11 @@ class TollSystemOrchestrator:
         ]
         
         # Wait for all tasks to complete (they run indefinitely)
-        await asyncio.gather(*tasks)
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await self.image_processor.emit_fused_plates(self.image_processor.fusion.flush_all())
+            self.image_processor.close()
     
     async def process_violation_checks(self):
         """Periodic violation checks"""
@@ -734,7 +1111,7 @@ class TollSystemOrchestrator:
         query = """
         DELETE FROM captured_images 
         WHERE capture_timestamp < DATE_SUB(NOW(), INTERVAL :retention_days DAY)
-        AND processing_status IN ('processed', 'failed')
+        AND processing_status IN ('processed', 'failed', 'duplicate')
         """
         
         self.db_manager.execute_query(query, {'retention_days': retention_days})
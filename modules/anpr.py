@@ -1,14 +1,18 @@
 import simpy
 import random
 from sql import get_plates, get_number_plate
+from plate_fusion import PlateFusion
 
 
 class ANPRCamera:
-    def __init__(self, env, camera_id, location, interval=5):
+    def __init__(self, env, camera_id, location, interval=5, fusion=None, lane_id=None):
         self.env = env
         self.camera_id = camera_id
         self.location = location
         self.interval = interval  # time between captures
+        # Cameras sharing a fusion and lane report one consolidated plate per vehicle
+        self.fusion = fusion
+        self.lane_id = lane_id if lane_id is not None else camera_id
         self.process = env.process(self.run())
 
     def run(self):
@@ -26,8 +30,12 @@ class ANPRCamera:
                     confidence_level=confidence
                 )
                 vehicle.flag_for_review()
-            else:
+            elif self.fusion is None:
                 print(f"{self.env.now}: Camera-{self.camera_id} detected plate '{plate}' confidently at {self.location}.")
+            else:
+                for fused in self.fusion.add(self.location, self.lane_id, plate, confidence, self.env.now,
+                                             source=self.camera_id):
+                    report_fused_plate(self.env, fused)
 
     def capture_image(self):
         print(f"{self.env.now}: Camera-{self.camera_id} capturing image at {self.location}...")
@@ -47,6 +55,11 @@ class ANPRCamera:
         return anomaly
 
 
+def report_fused_plate(env, fused):
+    print(f"{env.now}: Vehicle at {fused.plaza_id} lane {fused.lane_id}: plate '{fused.plate}' "
+          f"from {fused.reads} reads (Conf: {fused.confidence:.2f})")
+
+
 class UnidentifiedVehicle:
     def __init__(self, location, captured_plate, image_url, confidence_level):
         self.location = location
@@ -65,7 +78,12 @@ class UnidentifiedVehicle:
 if __name__ == "__main__":
     env = simpy.Environment()
     print("Starting ANPR Camera Simulation...")
-    camera1 = ANPRCamera(env, camera_id=1, location="Main Gate", interval=4)
-    camera2 = ANPRCamera(env, camera_id=2, location="Back Entrance", interval=6)
+    fusion = PlateFusion(window_seconds=1.5)
+    # Front and rear camera of the same lane: their reads of one vehicle are fused
+    camera1 = ANPRCamera(env, camera_id=1, location="Main Gate", interval=4, fusion=fusion, lane_id=1)
+    camera2 = ANPRCamera(env, camera_id=2, location="Main Gate", interval=4, fusion=fusion, lane_id=1)
+    camera3 = ANPRCamera(env, camera_id=3, location="Back Entrance", interval=6, fusion=fusion)
     env.run(until=30)  # Run simulation for 30 time units
+    for fused in fusion.flush_all():
+        report_fused_plate(env, fused)
     print("Simulation completed.")
\ No newline at end of file
@@ -0,0 +1,284 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+from modules.logger import general_logger
+from modules.settings import load_settings
+
+
+def load_db_config(path="configs/config.json"):
+    with open(path) as f:
+        return json.load(f)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+class ConnectionPool:
+    """
+        Bounded, thread-safe pool of psycopg2 connections.
+        Idle connections are reused LIFO so the hottest ones stay warm; a connection
+        that sat idle longer than health_check_interval is pinged before reuse.
+    """
+
+    def __init__(self, db_config, min_size=1, max_size=10, acquire_timeout=5.0, health_check_interval=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool bounds: min_size={min_size}, max_size={max_size}")
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(conn, released_at)]
+        self._size = 0           # open connections, idle + borrowed
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "discarded": 0,
+            "acquired": 0,
+            "timeouts": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+            "wait_seconds_total": 0.0,
+        }
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(
+            dbname=self.db_config["database"],
+            user=self.db_config["username"],
+            password=self.db_config["password"],
+            host=self.db_config["host"],
+            port=self.db_config["port"]
+        )
+        self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        self._stats["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        self._stats["health_checks"] += 1
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            self._stats["health_check_failures"] += 1
+            return False
+
+    def acquire(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot now, connect outside the lock
+                    self._size += 1
+                    conn, released_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"No database connection available within {timeout}s "
+                                      f"(max_size={self.max_size})")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn, time.monotonic() - released_at):
+                self._discard(conn)
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats["acquired"] += 1
+            self._stats["wait_seconds_total"] += time.monotonic() - started
+        return conn
+
+    def release(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                # Never hand out a connection with an open or aborted transaction
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._size - len(self._idle),
+                "idle": len(self._idle),
+                **self._stats,
+            }
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db_config = load_db_config()
+                _pool = ConnectionPool(
+                    db_config,
+                    min_size=int(db_config.get("pool_min_size", 1)),
+                    max_size=int(db_config.get("pool_max_size", 10)),
+                    acquire_timeout=float(db_config.get("pool_acquire_timeout", 5.0)),
+                    health_check_interval=float(db_config.get("pool_health_check_interval", 30.0))
+                )
+                general_logger.info("Database pool ready (min=%s, max=%s)", _pool.min_size, _pool.max_size)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+
+# Callbacks to run once the current transaction of a connection commits, keyed by id(conn).
+# A connection is only ever used by the thread that borrowed it, so no lock is needed.
+_after_commit = {}
+
+
+def after_commit(conn, callback):
+    """
+        Run callback once what was just written on conn is committed: immediately in
+        autocommit mode, otherwise at the end of the enclosing unit_of_work (and never,
+        if it rolls back). Used for in-process caches that must not get ahead of the DB.
+    """
+    if conn.autocommit:
+        callback()
+    else:
+        _after_commit.setdefault(id(conn), []).append(callback)
+
+
+@contextmanager
+def pooled_connection(autocommit=True):
+    """
+        Borrow a connection from the shared pool for the duration of the block.
+        The connection is always returned; broken connections are dropped.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    discard = False
+    try:
+        conn.autocommit = autocommit
+        yield conn
+    except psycopg2.InterfaceError:
+        discard = True
+        raise
+    except psycopg2.OperationalError:
+        discard = conn.closed != 0
+        raise
+    finally:
+        _after_commit.pop(id(conn), None)
+        pool.release(conn, discard=discard)
+
+
+_tx_settings = load_settings("TRANSACTIONS")
+ASYNC_COMMIT_NON_FINANCIAL = _tx_settings.getboolean("async_commit_non_financial", fallback=True)
+
+
+class UnitOfWork:
+    """
+        One explicit transaction on a pooled connection. Code that moves money
+        (debits, ledger entries, settlements) calls mark_financial(); a transaction
+        without such writes, i.e. only notifications, alerts and incidents, may commit
+        with synchronous_commit off, so it does not wait for the WAL flush.
+    """
+
+    def __init__(self, conn, cur, async_commit):
+        self.conn = conn
+        self.cur = cur
+        self.async_commit = async_commit
+        self.financial = False
+
+    def mark_financial(self):
+        self.financial = True
+
+    def commit(self):
+        if self.async_commit and not self.financial:
+            # Only affects this transaction; evaluated by PostgreSQL at COMMIT time
+            self.cur.execute("SET LOCAL synchronous_commit TO OFF")
+        self.conn.commit()
+        for callback in _after_commit.pop(id(self.conn), ()):
+            callback()
+
+
+@contextmanager
+def unit_of_work(async_commit=None):
+    """
+        Run the block as a single transaction: committed when it exits normally,
+        rolled back when it raises.
+    """
+    async_commit = ASYNC_COMMIT_NON_FINANCIAL if async_commit is None else async_commit
+    with pooled_connection(autocommit=False) as conn, conn.cursor() as cur:
+        uow = UnitOfWork(conn, cur, async_commit)
+        try:
+            yield uow
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+            raise
+        uow.commit()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from modules.settings import load_settings
+
+
+class EventBus:
+    """
+        In-process fan-out of committed notifications, security alerts and incidents to
+        streaming subscribers. Publishers (any worker thread, normally from an
+        after_commit callback) append to a bounded ring buffer and wake each event loop
+        once; every subscriber on that loop then reads what it has not seen yet from the
+        buffer and applies its own filters, so N consoles cost one append plus N cheap
+        buffer reads instead of N database polls.
+        Event ids are "<epoch>-<seq>" so a reconnecting console can resume where it left
+        off; ids from an earlier process, or older than the buffer, are answered with a
+        reset telling the console to reload through the REST endpoints.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.epoch = format(int(time.time()), "x")
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=capacity)   # (seq, event)
+        self._seq = 0
+        self._wakers = {}                       # event loop -> asyncio.Event of the current generation
+        self._subscribers = 0
+        self._stats = {"published": 0, "resets": 0}
+
+    # ---- publisher side ----
+
+    def publish(self, kind, data, event_type=None, priority=None, plaza_id=None):
+        event = {"kind": kind, "type": event_type, "priority": priority, "plaza_id": plaza_id, "data": data}
+        with self._lock:
+            self._seq += 1
+            event["id"] = f"{self.epoch}-{self._seq}"
+            self._events.append((self._seq, event))
+            self._stats["published"] += 1
+            loops = list(self._wakers)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._wake, loop)
+            except RuntimeError:
+                # Loop closed under us
+                with self._lock:
+                    self._wakers.pop(loop, None)
+
+    def _wake(self, loop):
+        # Runs on the loop: start a new generation, release everyone waiting on the old one
+        with self._lock:
+            waker = self._wakers.get(loop)
+            if waker is None:
+                return
+            self._wakers[loop] = asyncio.Event()
+        waker.set()
+
+    # ---- subscriber side ----
+
+    def head(self):
+        with self._lock:
+            return self._seq
+
+    def resume_point(self, last_event_id):
+        """(seq to continue after, needs_reset) for a client's Last-Event-ID."""
+        if not last_event_id:
+            return self.head(), False
+        epoch, _, seq = last_event_id.partition("-")
+        with self._lock:
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq or int(seq) < oldest - 1:
+                self._stats["resets"] += 1
+                return self._seq, True
+        return int(seq), False
+
+    def events_after(self, seq):
+        """Buffered events newer than seq, oldest first; None when seq fell out of the buffer."""
+        newer = []
+        with self._lock:
+            if self._events and seq < self._events[0][0] - 1:
+                return None
+            for event_seq, event in reversed(self._events):
+                if event_seq <= seq:
+                    break
+                newer.append(event)
+        newer.reverse()
+        return newer
+
+    def waker(self):
+        """The current generation's asyncio.Event for the running loop; take it before reading."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waker = self._wakers.get(loop)
+            if waker is None:
+                waker = self._wakers[loop] = asyncio.Event()
+            return waker
+
+    def subscribed(self, delta):
+        with self._lock:
+            self._subscribers += delta
+
+    def stats(self):
+        with self._lock:
+            return {
+                "epoch": self.epoch,
+                "capacity": self.capacity,
+                "buffered": len(self._events),
+                "last_seq": self._seq,
+                "subscribers": self._subscribers,
+                **self._stats,
+            }
+
+
+def matches(event, kinds=None, plaza_id=None, types=None, priorities=None):
+    return ((not kinds or event["kind"] in kinds)
+            and (not plaza_id or event["plaza_id"] == plaza_id)
+            and (not types or event["type"] in types)
+            and (not priorities or event["priority"] in priorities))
+
+
+def sse_message(event_id, event_name, data):
+    return f"id: {event_id}\nevent: {event_name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_events(bus, is_disconnected, last_event_id=None, heartbeat=15.0, **filters):
+    """Async generator of SSE frames for one subscriber, until is_disconnected() says so."""
+    seq, reset = bus.resume_point(last_event_id)
+    bus.subscribed(1)
+    try:
+        yield "retry: 3000\n\n"
+        if reset:
+            yield sse_message(f"{bus.epoch}-{seq}", "reset", {"reason": "resume point no longer buffered"})
+        while True:
+            waker = bus.waker()
+            events = bus.events_after(seq)
+            if events is None:
+                # This subscriber fell further behind than the buffer holds
+                seq, _ = bus.resume_point(None)
+                yield sse_message(f"{bus.epoch}-{seq}", "reset", {"reason": "subscriber fell behind"})
+                continue
+            for event in events:
+                seq = int(event["id"].rsplit("-", 1)[1])
+                if matches(event, **filters):
+                    yield sse_message(event["id"], event["kind"], event)
+            if events:
+                continue
+            try:
+                await asyncio.wait_for(waker.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+    finally:
+        bus.subscribed(-1)
+
+
+_settings = load_settings("EVENTS")
+event_bus = EventBus(capacity=_settings.getint("buffer_size", fallback=10000))
+STREAM_HEARTBEAT_SECONDS = _settings.getfloat("heartbeat_seconds", fallback=15.0)
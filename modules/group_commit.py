@@ -0,0 +1,224 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import psycopg2
+
+from modules.db_pool import load_db_config
+from modules.logger import alert_logger, general_logger
+from modules.metrics import Histogram, metrics_enabled, register, stage_seconds
+from modules.settings import load_settings
+
+# Applies every accepted debit of a group and writes their toll_transactions rows in
+# one statement. Debits of the same account are pre-summed by the writer.
+GROUP_DEBIT_SQL = """
+    WITH debit AS (
+        UPDATE accounts a
+        SET balance = a.balance - d.total
+        FROM unnest(%(debit_accounts)s::varchar[], %(debit_totals)s::double precision[])
+            AS d(account_id, total)
+        WHERE a.account_id = d.account_id
+    )
+    INSERT INTO toll_transactions (
+        transaction_id, timestamp, amount, distance, status, security_flag, rfid_tag_id, plaza_id
+    )
+    SELECT gen_random_uuid(), NOW(), t.amount, 15.0, 'SUCCESS', FALSE, t.tag_id, t.plaza_id
+    FROM unnest(%(amounts)s::double precision[], %(tags)s::varchar[], %(plazas)s::varchar[])
+        AS t(amount, tag_id, plaza_id)
+"""
+
+batch_sizes = register(Histogram(
+    "anpr_group_commit_batch_size",
+    "Debits written per group commit.",
+    ("table",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+))
+
+
+class GroupCommitWriter:
+    """
+        Collects check-and-debit requests from concurrent toll decisions for up to
+        window seconds (or max_batch requests), then applies them with one lock query,
+        one multi-row write and one commit on a dedicated connection. Requests against
+        the same account are applied in arrival order against a running balance, exactly
+        as if they had been sent one by one. Each caller blocks until the group is
+        durably committed and gets the same result deduct_toll_if_funded would return.
+        The debit and its toll_transactions row commit on the writer's connection, not in
+        the caller's transaction: a caller that rolls back afterwards keeps the charge.
+        A request is only bounded before it is queued (enqueue_timeout against a full
+        queue of max_queued); once queued, the caller waits for the real outcome, so a
+        debit is never reported as failed and then committed behind the caller's back.
+    """
+
+    def __init__(self, window=0.002, max_batch=128, max_queued=4096, enqueue_timeout=5.0):
+        self.window = window
+        self.max_batch = max_batch
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._conn = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+        self._stats = {"batches": 0, "debits": 0, "failed_batches": 0}
+
+    # ---- caller side ----
+
+    def submit(self, account_id, tag_id, amount, plaza_id):
+        future = Future()
+        with self._start_lock:
+            # Checked under the lock close() takes, so nothing is queued behind the
+            # writer's last drain and left waiting forever
+            if self._stopping:
+                raise RuntimeError("Group commit writer is shutting down")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+            # Raises queue.Full when the writer is this far behind; nothing was debited then
+            self._queue.put((account_id, tag_id, amount, plaza_id, future), timeout=self.enqueue_timeout)
+        return future
+
+    def debit_if_funded(self, account_id, tag_id, amount, plaza_id):
+        started = time.perf_counter()
+        # No timeout once queued: the writer always resolves the future, with the
+        # committed result or the exception that rolled the group back
+        result = self.submit(account_id, tag_id, amount, plaza_id).result()
+        if metrics_enabled:
+            stage_seconds.observe(("group_commit", "wait"), time.perf_counter() - started)
+        return result
+
+    # ---- writer thread ----
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            # Dedicated connection: waiting callers may hold every pooled one
+            db_config = load_db_config()
+            self._conn = psycopg2.connect(
+                dbname=db_config["database"],
+                user=db_config["username"],
+                password=db_config["password"],
+                host=db_config["host"],
+                port=db_config["port"]
+            )
+            self._conn.autocommit = False
+        return self._conn
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [item for item in self._collect() if item is not None]
+            if batch:
+                self._flush(batch)
+            if self._stopping and self._queue.empty():
+                return
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        try:
+            conn = self._connection()
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT account_id, balance FROM accounts
+                    WHERE account_id = ANY(%s) AND is_active = TRUE
+                    ORDER BY account_id
+                    FOR UPDATE
+                """, (sorted({item[0] for item in batch}),))
+                balances = dict(cur.fetchall())
+
+                results, totals = [], {}
+                amounts, tags, plazas = [], [], []
+                for account_id, tag_id, amount, plaza_id, _ in batch:
+                    if account_id not in balances:
+                        results.append(None)
+                    elif balances[account_id] >= amount:
+                        balances[account_id] -= amount
+                        totals[account_id] = totals.get(account_id, 0) + amount
+                        amounts.append(amount)
+                        tags.append(tag_id)
+                        plazas.append(plaza_id)
+                        results.append({"paid": True, "balance": balances[account_id]})
+                    else:
+                        results.append({"paid": False, "balance": balances[account_id]})
+
+                if totals:
+                    cur.execute(GROUP_DEBIT_SQL, {
+                        "debit_accounts": list(totals), "debit_totals": list(totals.values()),
+                        "amounts": amounts, "tags": tags, "plazas": plazas,
+                    })
+            conn.commit()
+        except Exception as e:
+            self._stats["failed_batches"] += 1
+            alert_logger.error("Group commit of %s debits failed: %s", len(batch), e)
+            self._reset_connection()
+            for item in batch:
+                item[-1].set_exception(e)
+            return
+
+        self._stats["batches"] += 1
+        self._stats["debits"] += len(batch)
+        if metrics_enabled:
+            stage_seconds.observe(("group_commit", "flush"), time.perf_counter() - started)
+            batch_sizes.observe(("toll_transactions",), len(batch))
+        for item, result in zip(batch, results):
+            item[-1].set_result(result)
+
+    def _reset_connection(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.rollback()
+        except psycopg2.Error:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+            self._conn = None
+
+    def stats(self):
+        return {"window_ms": self.window * 1000, "max_batch": self.max_batch,
+                "queued": self._queue.qsize(), **self._stats}
+
+    def close(self, timeout=30.0):
+        """
+            Flush whatever is queued and stop the writer thread. Debits submitted while
+            closing are refused; once it has stopped, the next one starts a new writer.
+        """
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._stopping = True
+            thread = self._thread
+        self._queue.put(None)
+        thread.join(timeout=timeout)
+        if thread.is_alive():
+            # Still flushing: keep refusing new debits rather than queue them behind it
+            alert_logger.error("Group commit writer did not stop within %ss", timeout)
+            return
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        with self._start_lock:
+            self._thread = None
+            self._stopping = False
+
+
+_settings = load_settings("GROUP_COMMIT")
+group_commit_enabled = _settings.getboolean("enabled", fallback=False)
+group_commit = GroupCommitWriter(
+    window=_settings.getfloat("window_ms", fallback=2.0) / 1000,
+    max_batch=_settings.getint("max_batch", fallback=128),
+    max_queued=_settings.getint("max_queued", fallback=4096),
+    enqueue_timeout=_settings.getfloat("enqueue_timeout", fallback=5.0)
+)
+if group_commit_enabled:
+    general_logger.info("Group commit enabled (window=%ss, max_batch=%s)", group_commit.window, group_commit.max_batch)
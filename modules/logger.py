@@ -1,8 +1,11 @@
+import atexit
 import logging
 import os
+import queue
+import threading
 import configparser
 from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 
 def load_config(path="configs/logger.ini"):
     config = configparser.ConfigParser()
@@ -12,18 +15,82 @@ def load_config(path="configs/logger.ini"):
     return config["LOGGING"]
 
 
-def setup_rotating_logger(name, log_dir, prefix, level=logging.INFO, when='midnight', backup_count=7):
+class BoundedQueueHandler(QueueHandler):
+    """
+        Request-side half of the queue logging mode: only puts the record on a bounded queue.
+        Formatting is left to the listener thread, so %-style arguments are rendered there.
+        overflow: drop_new (discard the incoming record), drop_oldest (make room) or block
+        (wait up to block_timeout, then drop). Records of the never_drop loggers always wait
+        for room instead. Every dropped record is counted, in total and per logger.
+    """
+
+    def __init__(self, log_queue, overflow="block", block_timeout=0.05, never_drop=("alert_logger",)):
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.never_drop = frozenset(never_drop)
+        self._lock_stats = threading.Lock()
+        self.stats = {"enqueued": 0, "dropped": 0, "high_water": 0}
+
+    def prepare(self, record):
+        # Same process: hand the record over untouched instead of formatting it here
+        return record
+
+    def _count(self, key, record=None):
+        with self._lock_stats:
+            self.stats[key] += 1
+            if key == "enqueued":
+                self.stats["high_water"] = max(self.stats["high_water"], self.queue.qsize())
+            elif record is not None:
+                per_logger = f"dropped_{record.name}"
+                self.stats[per_logger] = self.stats.get(per_logger, 0) + 1
+
+    def enqueue(self, record):
+        if record.name in self.never_drop:
+            self.queue.put(record)
+            self._count("enqueued")
+            return
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow != "drop_oldest":
+                self._count("dropped", record)
+                return
+            try:
+                oldest = self.queue.get_nowait()
+                if oldest.name in self.never_drop:
+                    # Not ours to discard: put it back and drop the new record instead
+                    self.queue.put(oldest)
+                    self._count("dropped", record)
+                    return
+                self._count("dropped", oldest)
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                self._count("dropped", record)
+                return
+        self._count("enqueued")
+
+
+class RoutingQueueListener(QueueListener):
+    """Single background writer: sends each record to the file handler of the logger that emitted it."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.routes = {}
+
+    def handle(self, record):
+        handler = self.routes.get(record.name)
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+
+
+def build_file_handler(log_dir, prefix, when='midnight', backup_count=7):
     os.makedirs(log_dir, exist_ok=True)
     log_file_path = os.path.join(log_dir, f"{prefix}.log")
 
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    logger.propagate = False  # logs loop handler again
-
-    # REMOVE existing handlers to avoid duplicates during reload
-    if logger.hasHandlers():
-        logger.handlers.clear()
-
     handler = TimedRotatingFileHandler(
         log_file_path,
         when=when,
@@ -35,14 +102,67 @@ def setup_rotating_logger(name, log_dir, prefix, level=logging.INFO, when='midni
     handler.suffix = "%d_%m_%Y"
     formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(name)s | %(message)s')
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    return handler
+
+
+def setup_rotating_logger(name, log_dir, prefix, level=logging.INFO, when='midnight', backup_count=7):
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False  # logs loop handler again
+
+    # REMOVE existing handlers to avoid duplicates during reload
+    if logger.hasHandlers():
+        logger.handlers.clear()
+
+    handler = build_file_handler(log_dir, prefix, when, backup_count)
+    if queue_handler is None:
+        logger.addHandler(handler)
+    else:
+        # Queue mode: the file handler only runs on the listener thread
+        queue_listener.routes[name] = handler
+        logger.addHandler(queue_handler)
 
     return logger
 
 
+def shutdown_logging():
+    """Drain the queue and stop the listener; safe to call more than once."""
+    global queue_listener
+    listener, queue_listener = queue_listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.routes.values():
+            handler.close()
+
+
+def logging_stats():
+    if queue_handler is None:
+        return {"mode": "sync"}
+    return {
+        "mode": "queue",
+        "overflow": queue_handler.overflow,
+        "queue_size": queue_handler.queue.maxsize,
+        "queued": queue_handler.queue.qsize(),
+        **queue_handler.stats,
+    }
+
+
 # Load configuration
 log_config = load_config()
 log_level = getattr(logging, log_config.get("log_level", "INFO"))
+log_mode = log_config.get("log_mode", "sync")
+
+queue_handler = None
+queue_listener = None
+if log_mode == "queue":
+    _log_queue = queue.Queue(maxsize=log_config.getint("queue_size", fallback=10000))
+    queue_handler = BoundedQueueHandler(
+        _log_queue,
+        overflow=log_config.get("queue_overflow", "block"),
+        block_timeout=log_config.getfloat("queue_block_timeout", fallback=0.05),
+        never_drop=[name.strip() for name in log_config.get("queue_never_drop", "alert_logger").split(",") if name.strip()]
+    )
+    queue_listener = RoutingQueueListener(_log_queue)
 
 # Setup each logger
 plate_logger = setup_rotating_logger(
@@ -80,8 +200,9 @@ general_logger = setup_rotating_logger(
     log_level
 )
 
-
-log_config = load_config()
+if queue_listener is not None:
+    queue_listener.start()
+    atexit.register(shutdown_logging)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,219 @@
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from modules.settings import load_settings
+
+# Upper bounds in seconds; sized for a toll path that should finish in single-digit ms
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _label_text(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class _Sharded:
+    """
+        Per-thread series storage: each thread only ever writes its own dict, so the
+        hot path takes no lock; render() merges the shards of every thread seen so far.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.series
+        except AttributeError:
+            series = self._local.series = {}
+            with self._shards_lock:
+                self._shards.append(series)
+            return series
+
+    def _snapshots(self):
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict.copy() runs without releasing the GIL, so a writer never tears it
+        return [shard.copy() for shard in shards]
+
+
+class Histogram(_Sharded):
+    """Fixed-bucket latency histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        super().__init__()
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, seconds):
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        merged = {}
+        for shard in self._snapshots():
+            for labels, series in shard.items():
+                total = merged.setdefault(labels, [0] * len(series))
+                for i, value in enumerate(series):
+                    total[i] += value
+        for labels, series in sorted(merged.items()):
+            label_text = _label_text(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+class Counter(_Sharded):
+    def __init__(self, name, help_text, label_names):
+        super().__init__()
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+
+    def inc(self, labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        merged = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                merged[labels] = merged.get(labels, 0) + value
+        for labels, value in sorted(merged.items()):
+            lines.append(f"{self.name}{{{_label_text(self.label_names, labels)}}} {value}")
+        return lines
+
+
+_settings = load_settings("METRICS")
+metrics_enabled = _settings.getboolean("enabled", fallback=True)
+
+stage_seconds = Histogram(
+    "anpr_stage_duration_seconds",
+    "Time spent per operation and stage.",
+    ("operation", "stage")
+)
+toll_outcomes = Counter(
+    "anpr_toll_outcomes_total",
+    "Toll decisions per outcome status and plaza.",
+    ("operation", "status", "plaza_id")
+)
+
+# Everything render_metrics() exposes; other modules add their own series with register()
+REGISTRY = [stage_seconds, toll_outcomes]
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+class timed:
+    """
+        with timed("toll", "vehicle_lookup"): ...
+        Records the block's wall time into stage_seconds; a no-op when metrics are disabled.
+    """
+    __slots__ = ("labels", "started")
+
+    def __init__(self, operation, stage):
+        self.labels = (operation, stage)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if metrics_enabled:
+            stage_seconds.observe(self.labels, time.perf_counter() - self.started)
+        return False
+
+
+def instrumented(operation, stage="total"):
+    """Decorator form of timed() for whole functions."""
+    def decorator(func):
+        labels = (operation, stage)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics_enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stage_seconds.observe(labels, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def instrumented_decision(operation):
+    """
+        Decorator for toll decision functions taking a plaza_id argument and returning a
+        status dict: times the call as (operation, "total") and counts its outcome.
+    """
+    def decorator(func):
+        parameters = inspect.signature(func).parameters
+        position = list(parameters).index("plaza_id")
+        default = parameters["plaza_id"].default
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics_enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            stage_seconds.observe((operation, "total"), time.perf_counter() - started)
+            plaza_id = kwargs.get("plaza_id", args[position] if len(args) > position else default)
+            count_outcome(operation, result, plaza_id)
+            return result
+        return wrapper
+    return decorator
+
+
+def count_outcome(operation, result, plaza_id):
+    if metrics_enabled and isinstance(result, dict):
+        status = result.get("status", "UNKNOWN")
+        # Unknown plazas come straight from the request; never turn them into label values
+        plaza = "unknown" if status in ("INVALID_PLAZA", "ERROR") and plaza_id else (plaza_id or "none")
+        toll_outcomes.inc((operation, status, plaza))
+
+
+def _gauges(prefix, help_text, stats):
+    """Render a flat stats dict (numbers only) as gauges named prefix_<key>."""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines.append(f"# HELP {name} {help_text} ({key}).")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return lines
+
+
+def render_metrics(sources=()):
+    """
+        Prometheus text exposition of every registered histogram and counter, plus one gauge
+        per numeric field of every (prefix, help, stats_dict) in sources.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for prefix, help_text, stats in sources:
+        lines.extend(_gauges(prefix, help_text, stats))
+    return "\n".join(lines) + "\n"
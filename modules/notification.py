@@ -1,6 +1,23 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+import base64
+import hashlib
+import threading
+import time
 import uuid
 from modules.logger import alert_logger
+from modules.settings import load_settings
+from modules.metrics import instrumented
+from modules.db_pool import after_commit
+from modules.event_bus import event_bus
+
+_settings = load_settings("NOTIFICATIONS")
+DEDUP_WINDOW_SECONDS = int(_settings.getfloat("dedup_window_hours", fallback=24) * 3600)
+RECENT_FINGERPRINTS_MAX = _settings.getint("recent_fingerprints_max", fallback=50000)
+HISTORY_DAYS = _settings.getint("history_days", fallback=90)
+PAGE_SIZE = _settings.getint("page_size", fallback=50)
+MAX_PAGE_SIZE = _settings.getint("max_page_size", fallback=200)
+UNREAD_COUNT_CAP = _settings.getint("unread_count_cap", fallback=1000)
 
 def is_valid_uuid(val):
     try:
@@ -9,7 +26,57 @@ def is_valid_uuid(val):
     except ValueError:
         return False
 
+class RecentFingerprints:
+    """Bounded LRU set of (fingerprint, bucket) pairs this process already stored or saw rejected."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                self.stats["hits"] += 1
+                return True
+            self.stats["misses"] += 1
+            return False
+
+    def add(self, key):
+        with self._lock:
+            self._seen[key] = True
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+
+
+recent_fingerprints = RecentFingerprints(RECENT_FINGERPRINTS_MAX)
+
+
+def notification_fingerprint(notif_type, priority, message, vehicle_id=None, plaza_id=None):
+    """
+        Stable digest of what makes two notifications duplicates. Taken over the caller's
+        message, before vehicle details / payment links are appended, since those are
+        derived from vehicle_id which is part of the digest anyway.
+    """
+    raw = "\x1f".join(str(part) for part in (notif_type, priority, message, vehicle_id or "", plaza_id or ""))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def dedup_bucket(now=None):
+    return int((now or time.time()) // DEDUP_WINDOW_SECONDS)
+
+
+@instrumented("create_notification")
 def create_notification(cur, notif_type, message, priority, vehicle_id=None, plaza_id=None):
+    # Step 0: Skip repeats this process already stored in the current dedup bucket
+    fingerprint = notification_fingerprint(notif_type, priority, message, vehicle_id, plaza_id)
+    bucket = dedup_bucket()
+    if (fingerprint, bucket) in recent_fingerprints:
+        return
+
     vehicle_info = ""
 
     # Step 1: Append vehicle details if vehicle_id is a valid UUID
@@ -37,54 +104,207 @@ def create_notification(cur, notif_type, message, priority, vehicle_id=None, pla
     elif notif_type in ["TAG_MISSING", "LICENSE_MISSING", "UNMATCHED_PLATE"]:
         message += vehicle_info
 
-    # Step 3: Prevent duplicate entries
-    cur.execute("""
-        SELECT 1 FROM notification
-        WHERE message = %s AND type = %s AND priority = %s
-        AND timestamp >= NOW() - INTERVAL '1 day'
-    """, (message, notif_type, priority))
-    if cur.fetchone():
-        return
-
-    # Step 4: Insert new notification
+    # Step 3 + 4: Claim the fingerprint for this bucket and insert only if it was free,
+    # one statement backed by the primary key of notification_fingerprints
     cur.execute("""
+        WITH claim AS (
+            INSERT INTO notification_fingerprints (fingerprint, bucket)
+            VALUES (%s, %s)
+            ON CONFLICT DO NOTHING
+            RETURNING fingerprint
+        )
         INSERT INTO notification (
             notification_id, message, timestamp, type, priority, status, vehicle_id, plaza_id
-        ) VALUES (
-            gen_random_uuid(), %s, NOW(), %s, %s, 'unread', %s, %s
         )
+        SELECT gen_random_uuid(), %s, NOW(), %s, %s, 'unread', %s, %s
+        FROM claim
+        RETURNING notification_id, timestamp, vehicle_id
     """, (
+        fingerprint, bucket,
         message, notif_type, priority,
         vehicle_id if is_valid_uuid(vehicle_id) else None,
         plaza_id
     ))
-    alert_logger.info(f"NOTIFICATION [{notif_type}] | {message}")
+    inserted = cur.fetchone()
+    # Inside a unit of work the claim may still be rolled back
+    after_commit(cur.connection, lambda: recent_fingerprints.add((fingerprint, bucket)))
+    if inserted:
+        notification_id, timestamp, stored_vehicle_id = inserted
+        after_commit(cur.connection, lambda: event_bus.publish("notification", {
+            "notification_id": notification_id, "timestamp": timestamp, "message": message,
+            "vehicle_id": stored_vehicle_id, "status": "unread",
+        }, event_type=notif_type, priority=priority, plaza_id=plaza_id))
+        alert_logger.info(f"NOTIFICATION [{notif_type}] | {message}")
 
-def get_notifications_by_plate(cur, license_plate, only_unread=False):
+def history_start(since=None):
+    """
+        Lower timestamp bound for notification reads. Passed as a literal value (not NOW())
+        so the planner prunes the partitions outside the window at plan time.
+    """
+    return since or datetime.now(timezone.utc) - timedelta(days=HISTORY_DAYS)
+
+
+def get_notifications_by_plate(cur, license_plate, only_unread=False, since=None):
     base_query = """
         SELECT n.notification_id, n.message, n.timestamp, n.type, n.priority, n.status
         FROM notification n
         JOIN vehicles v ON v.vehicle_id = n.vehicle_id
-        WHERE v.license_plate = %s
+        WHERE v.license_plate = %s AND n.timestamp >= %s
     """
     if only_unread:
         base_query += " AND n.status = 'unread'"
     base_query += " ORDER BY n.timestamp DESC"
 
-    cur.execute(base_query, (license_plate,))
+    cur.execute(base_query, (license_plate, history_start(since)))
     return cur.fetchall()
 
-def get_notifications_by_plate_and_tag(cur, license_plate, tag_id):
+def get_notifications_by_plate_and_tag(cur, license_plate, tag_id, since=None):
     cur.execute("""
         SELECT n.notification_id, n.message, n.timestamp, n.type, n.priority
         FROM notification n
         JOIN vehicles v ON v.vehicle_id = n.vehicle_id
         JOIN rfid_tags t ON t.vehicle_id = v.vehicle_id
-        WHERE v.license_plate = %s AND t.tag_id = %s
+        WHERE v.license_plate = %s AND t.tag_id = %s AND n.timestamp >= %s
         ORDER BY n.timestamp DESC
-    """, (license_plate, tag_id))
+    """, (license_plate, tag_id, history_start(since)))
     return cur.fetchall()
 
+# How the vehicle is resolved and validated for each lookup mode; tag_ok carries the
+# "has an active tag" / "plate and tag belong together" checks into the page query.
+_PAGE_VEHICLE = {
+    "plate": """
+        SELECT v.vehicle_id, v.license_plate,
+               EXISTS (SELECT 1 FROM rfid_tags r
+                       WHERE r.vehicle_id = v.vehicle_id AND r.is_active = TRUE) AS tag_ok
+        FROM vehicles v
+        WHERE v.license_plate = %(plate)s
+    """,
+    "tag": """
+        SELECT v.vehicle_id, v.license_plate, TRUE AS tag_ok
+        FROM rfid_tags r
+        JOIN vehicles v ON v.vehicle_id = r.vehicle_id
+        WHERE r.tag_id = %(tag_id)s AND r.is_active = TRUE
+    """,
+    "plate_and_tag": """
+        SELECT v.vehicle_id, v.license_plate,
+               EXISTS (SELECT 1 FROM rfid_tags r
+                       WHERE r.vehicle_id = v.vehicle_id AND r.tag_id = %(tag_id)s
+                         AND r.is_active = TRUE) AS tag_ok
+        FROM vehicles v
+        WHERE v.license_plate = %(plate)s
+    """,
+}
+
+# One round trip: vehicle + validation, one page of notifications newest first and a
+# capped unread count. Both reads walk idx_notification_vehicle_page /
+# idx_notification_vehicle_unread (db_scripts/notification_pagination.sql).
+NOTIFICATION_PAGE_SQL = """
+    WITH veh AS ({vehicle} LIMIT 1),
+    page AS (
+        SELECT n.notification_id, n.message, n.timestamp, n.type, n.priority, n.status
+        FROM veh
+        JOIN notification n ON n.vehicle_id = veh.vehicle_id
+        WHERE veh.tag_ok AND n.timestamp >= %(since)s {filters}
+        ORDER BY n.timestamp DESC, n.notification_id DESC
+        LIMIT %(limit)s
+    ),
+    unread AS (
+        SELECT COUNT(*) AS unread FROM (
+            SELECT 1
+            FROM veh
+            JOIN notification n ON n.vehicle_id = veh.vehicle_id
+            WHERE veh.tag_ok AND n.timestamp >= %(since)s AND n.status = 'unread'
+            LIMIT %(unread_cap)s
+        ) u
+    )
+    SELECT veh.license_plate, veh.tag_ok, unread.unread,
+           page.notification_id, page.message, page.timestamp, page.type, page.priority, page.status
+    FROM veh
+    CROSS JOIN unread
+    LEFT JOIN page ON TRUE
+    ORDER BY page.timestamp DESC, page.notification_id DESC
+"""
+
+NOTIFICATION_FIELDS = ("notification_id", "message", "timestamp", "type", "priority", "status")
+
+
+def encode_cursor(timestamp, notification_id):
+    raw = f"{timestamp.isoformat()}|{notification_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """(timestamp, notification_id) of the last row of the previous page; ValueError if malformed."""
+    try:
+        timestamp, notification_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(timestamp), str(uuid.UUID(notification_id))
+    except Exception as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+@instrumented("notification_page")
+def get_notification_page(cur, license_plate=None, tag_id=None, cursor=None, limit=PAGE_SIZE,
+                          status=None, notif_type=None, priority=None, since=None):
+    """
+        One page of a vehicle's notifications, newest first, looked up by plate, tag or both.
+        Returns {"status": "OK", "plate", "notifications", "next_cursor", "unread",
+        "unread_capped"}, or the same PLATE_MISSING / TAG_MISSING / TAG_NOT_FOUND /
+        MISMATCH status the lookup mode used to report.
+    """
+    mode = "plate_and_tag" if license_plate and tag_id else ("plate" if license_plate else "tag")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    params = {"plate": license_plate, "tag_id": tag_id, "since": history_start(since),
+              "limit": limit + 1, "unread_cap": UNREAD_COUNT_CAP}
+
+    filters = ""
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = decode_cursor(cursor)
+        # The plain upper bound lets the planner prune newer partitions as well
+        filters += (" AND n.timestamp <= %(cursor_ts)s"
+                    " AND (n.timestamp, n.notification_id) < (%(cursor_ts)s, %(cursor_id)s::uuid)")
+    for column, value in (("status", status), ("type", notif_type), ("priority", priority)):
+        if value:
+            params[column] = value
+            filters += f" AND n.{column} = %({column})s"
+
+    cur.execute(NOTIFICATION_PAGE_SQL.format(vehicle=_PAGE_VEHICLE[mode], filters=filters), params)
+    rows = cur.fetchall()
+
+    if not rows:
+        if mode == "plate":
+            return {"status": "PLATE_MISSING", "message": f"Plate '{license_plate}' not found.", "notifications": []}
+        if mode == "tag":
+            return {"status": "TAG_NOT_FOUND", "tag_id": tag_id, "message": "Tag not found or inactive."}
+        return {"status": "MISMATCH", "message": "Plate and tag do not match or tag inactive.", "notifications": []}
+
+    plate, tag_ok, unread = rows[0][:3]
+    if not tag_ok:
+        if mode == "plate":
+            return {"status": "TAG_MISSING", "plate": plate,
+                    "message": "RFID tag not found or inactive for the given plate.", "notifications": []}
+        return {"status": "MISMATCH", "message": "Plate and tag do not match or tag inactive.", "notifications": []}
+    if not plate:
+        return {"status": "PLATE_MISSING", "tag_id": tag_id, "message": "Plate not registered for this tag.",
+                "notifications": []}
+
+    notifications = [dict(zip(NOTIFICATION_FIELDS, row[3:])) for row in rows if row[3] is not None]
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        last = notifications[-1]
+        next_cursor = encode_cursor(last["timestamp"], last["notification_id"])
+
+    result = {"status": "OK", "plate": plate}
+    if tag_id:
+        result["tag_id"] = tag_id
+    result.update({
+        "notifications": notifications,
+        "next_cursor": next_cursor,
+        "unread": unread,
+        "unread_capped": unread >= UNREAD_COUNT_CAP,
+    })
+    return result
+
 def send_sms(phone_number, message):
     alert_logger.info(f"[SMS] To: {phone_number} | Message: {message}")
 
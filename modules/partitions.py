@@ -0,0 +1,281 @@
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+from modules.db_pool import pooled_connection
+from modules.logger import alert_logger, general_logger
+from modules.notification import DEDUP_WINDOW_SECONDS
+from modules.settings import load_settings
+
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<start>\d{8})$")
+
+
+def interval_start(day, interval):
+    """First day of the month / ISO week / day containing day."""
+    if interval == "month":
+        return day.replace(day=1)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def next_start(start, interval):
+    if interval == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if interval == "week":
+        return start + timedelta(days=7)
+    return start + timedelta(days=1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y%m%d}"
+
+
+class PartitionMaintenance:
+    """
+        Keeps the time-partitioned tables (db_scripts/partitioning.sql) healthy: creates
+        the partitions for the next premake intervals ahead of time, so inserts never
+        hit a missing range, and retires partitions whose whole range is older than the
+        table's retention by detaching (or dropping) them, which is a catalog change
+        instead of a bulk DELETE. Also prunes notification_fingerprints rows older than
+        the dedup window. Every DDL runs in its own short transaction under lock_timeout
+        so a busy table delays maintenance, never the toll path.
+        Rows outside every range land in the table's DEFAULT partition (<table>_default);
+        when their range is created they are moved into it in the same transaction.
+    """
+
+    def __init__(self, retention_days, interval="month", premake=3, action="detach",
+                 lock_timeout="2s", run_every=6 * 3600.0):
+        self.retention_days = dict(retention_days)
+        self.interval = interval
+        self.premake = premake
+        self.action = action
+        self.lock_timeout = lock_timeout
+        self.run_every = run_every
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_run = None
+        self._stats = {"runs": 0, "created": 0, "detached": 0, "dropped": 0,
+                       "fingerprints_pruned": 0, "moved_from_default": 0, "default_rows": 0, "errors": 0}
+
+    # ---- catalog ----
+
+    @staticmethod
+    def is_partitioned(cur, table):
+        cur.execute("""
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+        """, (table,))
+        return cur.fetchone() is not None
+
+    @staticmethod
+    def partitions(cur, table):
+        """{start date: partition name} of the partitions following the naming scheme."""
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = %s AND pg_table_is_visible(p.oid)
+        """, (table,))
+        found = {}
+        for (name,) in cur.fetchall():
+            match = PARTITION_NAME.match(name)
+            if match and match.group("table") == table:
+                found[datetime.strptime(match.group("start"), "%Y%m%d").date()] = name
+        return found
+
+    @staticmethod
+    def default_rows(cur, table, start=None, end=None):
+        """Rows in the table's DEFAULT partition (within [start, end) if given); None without one."""
+        cur.execute("SELECT to_regclass(%s)", (f"{table}_default",))
+        if cur.fetchone()[0] is None:
+            return None
+        if start is None:
+            cur.execute(f"SELECT COUNT(*) FROM {table}_default")
+        else:
+            cur.execute(f"""
+                SELECT COUNT(*) FROM {table}_default
+                WHERE timestamp >= %s AND timestamp < %s
+            """, (start, end))
+        return cur.fetchone()[0]
+
+    # ---- maintenance ----
+
+    def _ddl(self, conn, *statements):
+        """DDL statements in one transaction of their own; returns False (and logs) on failure."""
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = %s", (self.lock_timeout,))
+                for statement in statements:
+                    cur.execute(statement)
+            conn.commit()
+            return True
+        except psycopg2.Error as e:
+            conn.rollback()
+            self._stats["errors"] += 1
+            alert_logger.error("Partition maintenance failed (%s): %s", statements[-1].strip(), e)
+            return False
+
+    def ensure_partitions(self, conn, table, today):
+        with conn.cursor() as cur:
+            existing = self.partitions(cur, table)
+        conn.commit()
+        created = []
+        start = interval_start(today, self.interval)
+        for _ in range(self.premake + 1):
+            end = next_start(start, self.interval)
+            if start not in existing and self._create_partition(conn, table, start, end):
+                created.append(partition_name(table, start))
+            start = end
+        return created
+
+    def _create_partition(self, conn, table, start, end):
+        name = partition_name(table, start)
+        bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        with conn.cursor() as cur:
+            stray = self.default_rows(cur, table, start, end)
+        conn.commit()
+        if not stray:
+            return self._ddl(conn, f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES {bounds}")
+
+        # The default partition already holds rows of this range, which would make a plain
+        # CREATE ... PARTITION OF fail: build the table, move them in, then attach it
+        if not self._ddl(
+            conn,
+            f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+            f"""
+                WITH moved AS (
+                    DELETE FROM {table}_default
+                    WHERE timestamp >= '{start.isoformat()}' AND timestamp < '{end.isoformat()}'
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """,
+            f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"
+        ):
+            return False
+        self._stats["moved_from_default"] += stray
+        general_logger.info("Moved %s rows of %s from %s_default into %s", stray, table, table, name)
+        return True
+
+    def retire_partitions(self, conn, table, today):
+        retention = self.retention_days.get(table)
+        if not retention:
+            return []
+        cutoff = today - timedelta(days=retention)
+        with conn.cursor() as cur:
+            existing = self.partitions(cur, table)
+        conn.commit()
+        retired = []
+        for start, name in sorted(existing.items()):
+            # Only whole partitions: the newest row it can hold must be past retention
+            if next_start(start, self.interval) > cutoff:
+                break
+            if self.action == "drop":
+                ok = self._ddl(conn, f"DROP TABLE {name}")
+            else:
+                ok = self._ddl(conn, f"ALTER TABLE {table} DETACH PARTITION {name}")
+            if ok:
+                retired.append(name)
+        return retired
+
+    def prune_fingerprints(self, conn):
+        # Claims only matter within the current and previous dedup bucket
+        with conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM notification_fingerprints
+                WHERE created_at < NOW() - make_interval(secs => %s)
+            """, (2 * DEDUP_WINDOW_SECONDS,))
+            pruned = cur.rowcount
+        conn.commit()
+        return pruned
+
+    def run(self):
+        """One maintenance pass over every configured table; returns what it changed."""
+        with self._lock:
+            today = datetime.now(timezone.utc).date()
+            report = {"created": [], "retired": [], "skipped": [], "fingerprints_pruned": 0, "default_rows": {}}
+            with pooled_connection(autocommit=False) as conn:
+                for table in self.retention_days:
+                    with conn.cursor() as cur:
+                        partitioned = self.is_partitioned(cur, table)
+                    conn.commit()
+                    if not partitioned:
+                        report["skipped"].append(table)
+                        continue
+                    report["created"] += self.ensure_partitions(conn, table, today)
+                    report["retired"] += self.retire_partitions(conn, table, today)
+                    with conn.cursor() as cur:
+                        report["default_rows"][table] = self.default_rows(cur, table) or 0
+                    conn.commit()
+                try:
+                    report["fingerprints_pruned"] = self.prune_fingerprints(conn)
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    self._stats["errors"] += 1
+                    alert_logger.error("Pruning notification_fingerprints failed: %s", e)
+
+            self._stats["runs"] += 1
+            self._stats["created"] += len(report["created"])
+            self._stats["dropped" if self.action == "drop" else "detached"] += len(report["retired"])
+            self._stats["fingerprints_pruned"] += report["fingerprints_pruned"]
+            self._stats["default_rows"] = sum(report["default_rows"].values())
+            self._last_run = time.monotonic()
+        general_logger.info("Partition maintenance: %s", report)
+        if self._stats["default_rows"]:
+            alert_logger.warning("Rows outside every partition range: %s", report["default_rows"])
+        return report
+
+    def partitioned_tables(self):
+        with pooled_connection() as conn, conn.cursor() as cur:
+            return [table for table in self.retention_days if self.is_partitioned(cur, table)]
+
+    def start_scheduler(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._schedule, name="partition-maintenance", daemon=True)
+        self._thread.start()
+
+    def _schedule(self):
+        while True:
+            try:
+                self.run()
+            except Exception as e:
+                self._stats["errors"] += 1
+                alert_logger.error("Partition maintenance run failed: %s", e)
+            time.sleep(self.run_every)
+
+    def stats(self):
+        last_run = self._last_run
+        return {
+            "interval": self.interval,
+            "premake": self.premake,
+            "action": self.action,
+            "retention_days": self.retention_days,
+            "scheduled": self._thread is not None,
+            "seconds_since_run": None if last_run is None else round(time.monotonic() - last_run, 1),
+            **self._stats,
+        }
+
+
+_settings = load_settings("PARTITIONS")
+partition_maintenance_enabled = _settings.getboolean("enabled", fallback=True)
+partition_maintenance = PartitionMaintenance(
+    retention_days={
+        "toll_transactions": _settings.getint("toll_transactions_retention_days", fallback=730),
+        "notification": _settings.getint("notification_retention_days", fallback=180),
+    },
+    interval=_settings.get("interval", fallback="month"),
+    premake=_settings.getint("premake", fallback=3),
+    action=_settings.get("retention_action", fallback="detach"),
+    lock_timeout=_settings.get("lock_timeout", fallback="2s"),
+    run_every=_settings.getfloat("run_every_hours", fallback=6.0) * 3600
+)
+
+
+if __name__ == "__main__":
+    print(partition_maintenance.run())
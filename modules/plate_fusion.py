@@ -0,0 +1,242 @@
+import threading
+from collections import defaultdict
+
+
+def normalize_plate(plate):
+    return "".join(plate.split()).upper()
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class PlateTrack:
+    """Reads that belong to one vehicle passing one lane."""
+
+    __slots__ = ("plaza_id", "lane_id", "reads", "first_seen", "last_seen", "plate")
+
+    def __init__(self, plaza_id, lane_id):
+        self.plaza_id = plaza_id
+        self.lane_id = lane_id
+        self.reads = []             # (plate, confidence, timestamp, source)
+        self.first_seen = None
+        self.last_seen = None
+        self.plate = None           # running consensus
+
+    def add(self, plate, confidence, timestamp, source):
+        self.reads.append((plate, confidence, timestamp, source))
+        self.first_seen = timestamp if self.first_seen is None else min(self.first_seen, timestamp)
+        self.last_seen = timestamp if self.last_seen is None else max(self.last_seen, timestamp)
+        self.plate = consensus(self.reads)[0]
+
+
+def consensus(reads):
+    """
+        (plate, confidence, agreeing reads) for a list of (plate, confidence, ...) reads.
+        The plate length is voted first; then every position is voted among the reads of
+        that length, each read weighted by its confidence. The fused confidence is that of
+        the strongest read of the consensus plate (of the voted length, if no read spells
+        it exactly), so extra agreeing reads never lower it. Only real disagreement costs
+        confidence: when the length or any position won less than half the vote weight,
+        the confidence is scaled down by that share.
+    """
+    by_length = defaultdict(float)
+    for plate, confidence, *_ in reads:
+        by_length[len(plate)] += confidence
+    length = max(by_length, key=lambda n: (by_length[n], n))
+    voters = [(plate, confidence) for plate, confidence, *_ in reads if len(plate) == length]
+    total = sum(confidence for _, confidence in voters)
+    length_total = sum(by_length.values())
+    weakest = by_length[length] / length_total if length_total > 0 else 1.0
+    if total <= 0:
+        # All reads at zero confidence: plain majority per position
+        voters = [(plate, 1.0) for plate, _ in voters]
+        total = float(len(voters))
+
+    chars = []
+    for position in range(length):
+        votes = defaultdict(float)
+        for plate, confidence in voters:
+            votes[plate[position]] += confidence
+        char = max(sorted(votes), key=votes.get)
+        chars.append(char)
+        weakest = min(weakest, votes[char] / total)
+
+    plate = "".join(chars)
+    confidence = max((c for p, c, *_ in reads if p == plate), default=None)
+    if confidence is None:
+        confidence = max(c for p, c, *_ in reads if len(p) == length)
+    if weakest < 0.5:
+        confidence *= weakest / 0.5
+    return plate, confidence, len(voters)
+
+
+class FusedPlate:
+    """One consolidated plate event per vehicle and lane."""
+
+    __slots__ = ("plaza_id", "lane_id", "plate", "confidence", "reads", "agreeing_reads",
+                 "first_seen", "last_seen", "best_source")
+
+    def __init__(self, track):
+        plate, confidence, agreeing = consensus(track.reads)
+        best = max((read for read in track.reads if read[0] == plate), key=lambda read: read[1], default=None)
+        if best is None:
+            best = max(track.reads, key=lambda read: read[1])
+        self.plaza_id = track.plaza_id
+        self.lane_id = track.lane_id
+        self.plate = plate
+        self.confidence = confidence
+        self.reads = len(track.reads)
+        self.agreeing_reads = agreeing
+        self.first_seen = track.first_seen
+        self.last_seen = track.last_seen
+        # Source (frame, image row, ...) of the strongest read agreeing with the consensus
+        self.best_source = best[3]
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "best_source"}
+
+    def __repr__(self):
+        return (f"FusedPlate({self.plate!r}, confidence={self.confidence:.2f}, reads={self.reads}, "
+                f"plaza={self.plaza_id}, lane={self.lane_id})")
+
+
+class PlateFusion:
+    """
+        Groups plate reads per (plaza, lane): a read joins the lane's open track when it
+        is within window_seconds of that track's last read and at most max_char_diff edits
+        away from its consensus, otherwise it opens a new track (a second vehicle). A
+        track is closed, and emitted as one FusedPlate, once window_seconds pass without
+        a new read, judged against the newest read time seen on the same lane (event
+        time), so a backlog replays exactly like live traffic and a busy lane never
+        closes a quiet one early. Reads of a lane should arrive in capture order.
+        Timestamps are seconds (float).
+    """
+
+    def __init__(self, window_seconds=1.5, max_char_diff=2):
+        self.window_seconds = window_seconds
+        self.max_char_diff = max_char_diff
+        self._lock = threading.Lock()
+        self._tracks = defaultdict(list)        # (plaza_id, lane_id) -> [PlateTrack]
+        self._watermarks = {}                   # (plaza_id, lane_id) -> newest read time seen
+        self.stats = {"reads": 0, "events": 0, "merged_reads": 0}
+
+    def add(self, plaza_id, lane_id, plate, confidence, timestamp, source=None):
+        """Add one read; returns the FusedPlates of its lane's tracks this read's time closed."""
+        plate = normalize_plate(plate)
+        key = (plaza_id, lane_id)
+        with self._lock:
+            self.stats["reads"] += 1
+            watermark = self._watermarks.get(key)
+            self._watermarks[key] = timestamp if watermark is None else max(watermark, timestamp)
+            closed = self._close([key], lambda _: self._watermarks[key])
+
+            tracks = self._tracks[key]
+            match = None
+            for track in tracks:
+                if abs(timestamp - track.last_seen) <= self.window_seconds and \
+                        edit_distance(plate, track.plate, self.max_char_diff) <= self.max_char_diff:
+                    match = track
+                    break
+            if match is None:
+                match = PlateTrack(plaza_id, lane_id)
+                tracks.append(match)
+            else:
+                self.stats["merged_reads"] += 1
+            match.add(plate, confidence, timestamp, source)
+        return closed
+
+    def flush(self, now=None):
+        """
+            Close tracks idle for window_seconds as of their lane's newest read time, or as
+            of now (e.g. wall-clock time once the queue is drained) when that is later.
+        """
+        with self._lock:
+            def lane_now(key):
+                watermark = self._watermarks.get(key)
+                return watermark if now is None else max(now, watermark if watermark is not None else now)
+            return self._close(list(self._tracks), lane_now)
+
+    def flush_all(self):
+        """Close every open track, e.g. at shutdown."""
+        with self._lock:
+            return self._close(list(self._tracks), lambda _: None)
+
+    def watermark(self, plaza_id, lane_id):
+        with self._lock:
+            return self._watermarks.get((plaza_id, lane_id))
+
+    def _close(self, keys, lane_now):
+        closed = []
+        for key in keys:
+            if key not in self._tracks:
+                continue
+            now = lane_now(key)
+            keep = []
+            for track in self._tracks[key]:
+                if now is None or now - track.last_seen > self.window_seconds:
+                    closed.append(FusedPlate(track))
+                else:
+                    keep.append(track)
+            if keep:
+                self._tracks[key] = keep
+            else:
+                del self._tracks[key]
+        self.stats["events"] += len(closed)
+        closed.sort(key=lambda fused: fused.first_seen)
+        return closed
+
+    def open_tracks(self):
+        with self._lock:
+            return sum(len(tracks) for tracks in self._tracks.values())
+
+
+if __name__ == "__main__":
+    # Self-check: front and rear camera of one lane read the same car five times with
+    # OCR slips, then a second car follows; each must come out as one event
+    fusion = PlateFusion(window_seconds=1.5, max_char_diff=2)
+    reads = [
+        ("ABC1234", 0.91, 0.0, "front"),
+        ("A8C1234", 0.55, 0.2, "rear"),
+        ("ABC1Z34", 0.60, 0.4, "front"),
+        ("ABC1234", 0.88, 0.6, "rear"),
+        ("ABC 1234", 0.80, 0.8, "front"),
+        ("KLM9876", 0.93, 5.0, "front"),
+        ("KLM9B76", 0.70, 5.3, "rear"),
+    ]
+    events = []
+    for plate, confidence, timestamp, camera in reads:
+        events += fusion.add("Main Gate", 1, plate, confidence, timestamp, source=camera)
+    events += fusion.flush_all()
+    for event in events:
+        print(event, event.as_dict())
+    assert [(e.plate, e.reads) for e in events] == [("ABC1234", 5), ("KLM9876", 2)], events
+    assert events[0].best_source == "front" and events[0].confidence == 0.91
+
+    # One strong read plus a weaker one with an OCR slip keeps the strong read's confidence
+    events = fusion.add("Main Gate", 2, "XYZ7777", 92.0, 10.0) + fusion.add("Main Gate", 2, "XYZ7T77", 78.0, 10.3)
+    events += fusion.flush_all()
+    assert [(e.plate, e.confidence) for e in events] == [("XYZ7777", 92.0)], events
+    # A real split vote does cost confidence
+    assert consensus([("XYZ7777", 90.0), ("XYZ1111", 80.0), ("XYZ2222", 70.0)])[1] < 90.0
+
+    # Frames finish ANPR out of capture order: another lane's later read must not split
+    # this lane's vehicle
+    events = fusion.add("Main Gate", 3, "ABC1234", 90.0, 100.0)
+    events += fusion.add("Main Gate", 4, "QRS5555", 90.0, 103.0)
+    events += fusion.add("Main Gate", 3, "ABC1234", 88.0, 100.4)
+    events += fusion.flush_all()
+    assert sorted(e.plate for e in events) == ["ABC1234", "QRS5555"], events
+    print("OK", fusion.stats)
+
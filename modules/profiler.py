@@ -0,0 +1,206 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+from modules.logger import general_logger
+from modules.settings import load_settings
+
+
+class SamplingProfiler:
+    """
+        Statistical profiler for the live API. A sampler thread wakes every interval
+        while at least one watched request is in flight, reads every thread's stack via
+        sys._current_frames() and attributes it to the route whose endpoint is on that
+        stack. When a watched request finishes, the samples taken on its route during
+        its lifetime are kept if the request was picked by sample_rate or ran longer
+        than slow_threshold; everything else is discarded. Kept samples are aggregated
+        into collapsed stacks ("route;frame;frame count"), the input format of
+        flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, sample_rate=0.01, slow_threshold=0.0, interval=0.005, routes=(), max_stacks=20000,
+                 max_depth=64):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.interval = interval
+        self.routes = tuple(routes)
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._active = 0
+        self._tick = 0
+        self._pending = {}          # route path -> deque([tick, stack, committed])
+        self._stacks = {}           # collapsed stack -> samples
+        self._endpoints = {}        # endpoint code object -> route path
+        self._thread = None
+        self._stats = {"requests_watched": 0, "requests_kept": 0, "ticks": 0, "samples": 0,
+                       "samples_kept": 0, "stacks_dropped": 0}
+
+    # ---- request side (called from the middleware) ----
+
+    def register_routes(self, routes):
+        for route in routes:
+            endpoint = getattr(route, "endpoint", None)
+            if endpoint is not None and hasattr(endpoint, "__code__"):
+                self._endpoints[endpoint.__code__] = route.path
+
+    def watches(self, path):
+        if self.sample_rate <= 0 and self.slow_threshold <= 0:
+            return False
+        return not self.routes or path.startswith(self.routes)
+
+    def begin(self):
+        """
+            Returns (sampled, start_tick) and makes sure the sampler is running, or None
+            when this request can never be kept (not sampled and no slow threshold).
+        """
+        sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_threshold <= 0:
+            return None
+        with self._lock:
+            self._active += 1
+            self._stats["requests_watched"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+            return sampled, self._tick
+
+    def end(self, session, route_path, elapsed):
+        sampled, start_tick = session
+        keep = sampled or (self.slow_threshold > 0 and elapsed >= self.slow_threshold)
+        with self._lock:
+            self._active -= 1
+            pending = self._pending.get(route_path)
+            if keep and pending:
+                self._stats["requests_kept"] += 1
+                for entry in pending:
+                    if entry[0] >= start_tick and not entry[2]:
+                        entry[2] = True
+                        self._add(entry[1])
+            if self._active == 0:
+                # Nobody can claim older samples any more
+                self._pending.clear()
+
+    def _add(self, stack):
+        if stack in self._stacks:
+            self._stacks[stack] += 1
+        elif len(self._stacks) < self.max_stacks:
+            self._stacks[stack] = 1
+        else:
+            self._stats["stacks_dropped"] += 1
+            return
+        self._stats["samples_kept"] += 1
+
+    # ---- sampler thread ----
+
+    def _collapse(self, frame):
+        """(route path, collapsed stack) when an endpoint is on the stack, else None."""
+        names = []
+        route = None
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            if route is None:
+                route = self._endpoints.get(code)
+            frame = frame.f_back
+        if route is None:
+            return None
+        names.append(route)
+        return route, ";".join(reversed(names))
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                while self._active == 0:
+                    self._wake.wait()
+            time.sleep(self.interval)
+
+            frames = sys._current_frames()
+            samples = [collapsed for collapsed in (self._collapse(frame) for ident, frame in frames.items()
+                                                   if ident != me) if collapsed]
+            # Do not keep other threads' frames alive until the next tick
+            del frames
+
+            with self._lock:
+                self._tick += 1
+                self._stats["ticks"] += 1
+                self._stats["samples"] += len(samples)
+                for route, stack in samples:
+                    pending = self._pending.get(route)
+                    if pending is None:
+                        pending = self._pending[route] = deque(maxlen=10000)
+                    pending.append([self._tick, stack, False])
+
+    # ---- output ----
+
+    def collapsed(self, route=None):
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in stacks
+                       if route is None or stack.startswith(route + ";"))
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "slow_threshold_ms": self.slow_threshold * 1000,
+                "interval_ms": self.interval * 1000,
+                "routes": list(self.routes),
+                "active_requests": self._active,
+                "distinct_stacks": len(self._stacks),
+                **self._stats,
+            }
+
+
+class SamplingProfilerMiddleware:
+    """Pure ASGI middleware; only installed when [PROFILER] enabled = true."""
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.watches(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        session = self.profiler.begin()
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            self.profiler.end(session, getattr(route, "path", scope["path"]), time.perf_counter() - started)
+
+
+_settings = load_settings("PROFILER")
+profiler_enabled = _settings.getboolean("enabled", fallback=False)
+profiler = SamplingProfiler(
+    sample_rate=_settings.getfloat("sample_rate", fallback=0.01),
+    slow_threshold=_settings.getfloat("slow_threshold_ms", fallback=0.0) / 1000,
+    interval=_settings.getfloat("interval_ms", fallback=5.0) / 1000,
+    routes=[r.strip() for r in _settings.get("routes", fallback="").split(",") if r.strip()]
+)
+
+
+def install_profiler(app):
+    """Attach the middleware when enabled in system.ini; otherwise the app is untouched."""
+    if not profiler_enabled:
+        return
+    app.add_middleware(SamplingProfilerMiddleware, profiler=profiler)
+    general_logger.info("Sampling profiler enabled: %s", profiler.stats())
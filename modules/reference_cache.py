@@ -0,0 +1,89 @@
+import threading
+import time
+
+from modules.db_pool import pooled_connection
+from modules.logger import general_logger
+from modules.settings import load_settings
+
+
+class ReferenceCache:
+    """
+        In-process copy of the small, rarely changing reference tables
+        (toll_plazas and lov_vehicle_types). Lookups never touch the database while the
+        snapshot is fresh; it is reloaded after max_age seconds, on invalidate(), or on refresh().
+    """
+
+    def __init__(self, max_age=300.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()   # one reload at a time; readers keep the old snapshot
+        self._plazas = frozenset()
+        self._rates = {}
+        self._loaded_at = None
+        self._stats = {"loads": 0, "hits": 0, "misses": 0}
+
+    def load(self, cur):
+        cur.execute("SELECT plaza_id FROM toll_plazas")
+        plazas = frozenset(row[0] for row in cur.fetchall())
+        cur.execute("SELECT type_code, base_cost FROM lov_vehicle_types")
+        rates = dict(cur.fetchall())
+
+        with self._lock:
+            # Swap whole snapshots so readers never see a half-loaded cache
+            self._plazas, self._rates = plazas, rates
+            self._loaded_at = time.monotonic()
+            self._stats["loads"] += 1
+        general_logger.info(f"Reference cache loaded: {len(plazas)} plazas, {len(rates)} vehicle types")
+
+    def refresh(self, cur=None):
+        if cur is not None:
+            self.load(cur)
+            return
+        with pooled_connection() as conn, conn.cursor() as cur:
+            self.load(cur)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _stale(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > self.max_age
+
+    def _ensure_fresh(self, cur=None):
+        if self._stale():
+            with self._refresh_lock:
+                # Whoever waited on the lock finds the snapshot the first caller loaded
+                if self._stale():
+                    self.refresh(cur)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def plaza_exists(self, plaza_id, cur=None):
+        self._ensure_fresh(cur)
+        found = plaza_id in self._plazas
+        self._count("hits" if found else "misses")
+        return found
+
+    def toll_rate(self, vehicle_type, cur=None):
+        """Base cost for a vehicle type, or None when the type has no rate."""
+        self._ensure_fresh(cur)
+        rate = self._rates.get(vehicle_type)
+        self._count("hits" if rate is not None else "misses")
+        return rate
+
+    def stats(self):
+        loaded_at = self._loaded_at
+        return {
+            "plazas": len(self._plazas),
+            "vehicle_types": len(self._rates),
+            "age_seconds": None if loaded_at is None else round(time.monotonic() - loaded_at, 1),
+            "max_age": self.max_age,
+            **self._stats,
+        }
+
+
+_settings = load_settings("REFERENCE_CACHE")
+reference_cache = ReferenceCache(max_age=_settings.getfloat("max_age", fallback=300.0))
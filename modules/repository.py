@@ -0,0 +1,366 @@
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from modules.alerts import classify_security, run_security_checks
+from modules.db_pool import unit_of_work
+from modules.group_commit import group_commit, group_commit_enabled
+from modules.logger import alert_logger
+from modules.notification import create_notification, dedup_bucket, notification_fingerprint
+from modules.reference_cache import reference_cache
+from modules.resolution_cache import resolution_cache
+from modules.security import escalate_security_incident, trigger_security_alert
+from modules.toll_transaction import deduct_toll_if_funded
+
+
+# Everything a toll decision needs from the live tables, in one round trip, for any
+# number of events. Plazas and toll rates come from the in-process reference cache,
+# stolen / blacklisted status from the in-memory watchlist, and repeat passages are
+# answered by the resolution cache without this query at all.
+# Each event resolves its vehicle by tag when one was read (a supplied tag wins over
+# the plate), otherwise by plate together with the plate's first active tag.
+# Balances are deliberately not part of the context: the debit checks them atomically.
+TOLL_CONTEXT_SQL = """
+    WITH ev AS (
+        SELECT * FROM unnest(%(plates)s::varchar[], %(tags)s::varchar[])
+            WITH ORDINALITY AS e(license_plate, tag_id, ord)
+    )
+    SELECT
+        e.ord,
+        veh.vehicle_id, veh.license_plate, veh.vehicle_type, veh.owner_id, veh.tag_id,
+        acc.account_id
+    FROM ev e
+    LEFT JOIN LATERAL (
+        SELECT v.vehicle_id, v.license_plate, v.vehicle_type, v.owner_id, r.tag_id
+        FROM rfid_tags r
+        JOIN vehicles v ON v.vehicle_id = r.vehicle_id
+        WHERE e.tag_id IS NOT NULL AND r.tag_id = e.tag_id AND r.is_active = TRUE
+        UNION ALL
+        SELECT v.vehicle_id, v.license_plate, v.vehicle_type, v.owner_id,
+               (SELECT r.tag_id FROM rfid_tags r
+                WHERE r.vehicle_id = v.vehicle_id AND r.is_active = TRUE
+                LIMIT 1)
+        FROM vehicles v
+        WHERE e.tag_id IS NULL AND v.license_plate = e.license_plate
+        LIMIT 1
+    ) veh ON TRUE
+    LEFT JOIN accounts acc ON acc.owner_id = veh.owner_id AND acc.is_active = TRUE
+    ORDER BY e.ord
+"""
+
+TOLL_CONTEXT_COLUMNS = (
+    "ord",
+    "vehicle_id", "license_plate", "vehicle_type", "owner_id", "tag_id",
+    "account_id",
+)
+
+
+def fetch_toll_contexts(cur, events):
+    """
+        Resolve vehicle, tag and account for a list of (plaza_id, license_plate, tag_id)
+        events. Cached passages are served from the resolution cache, the rest with a
+        single query. Returns one dict per event, in input order; missing entities come
+        back as None.
+    """
+    contexts = [None] * len(events)
+    misses = []
+    for i, (_, license_plate, tag_id) in enumerate(events):
+        found, ctx = resolution_cache.get("passage", *passage_key(license_plate, tag_id))
+        if found:
+            contexts[i] = ctx
+        else:
+            misses.append(i)
+
+    if misses:
+        cur.execute(TOLL_CONTEXT_SQL, {
+            "plates": [events[i][1] for i in misses],
+            "tags": [events[i][2] for i in misses],
+        })
+        for i, row in zip(misses, cur.fetchall()):
+            ctx = dict(zip(TOLL_CONTEXT_COLUMNS, row))
+            if ctx["vehicle_id"]:
+                # Dropped when any of these rows changes (db_scripts/watchlist.sql triggers)
+                resolution_cache.put("passage", *passage_key(events[i][1], events[i][2]), ctx, refs=(
+                    ("vehicle", ctx["vehicle_id"]), ("tag", ctx["tag_id"]),
+                    ("account", ctx["account_id"]), ("owner", ctx["owner_id"]),
+                ))
+            contexts[i] = ctx
+    return contexts
+
+
+def passage_key(license_plate, tag_id):
+    return ("tag", tag_id) if tag_id else ("plate", license_plate)
+
+
+def fetch_toll_context(cur, plaza_id: str, license_plate: str = None, tag_id: str = None):
+    return fetch_toll_contexts(cur, [(plaza_id, license_plate, tag_id)])[0]
+
+
+def record_pending_toll(cur, vehicle_id, tag_id, plaza_id, toll):
+    cur.execute("""
+        INSERT INTO pending_toll_ledger (
+            ledger_id, vehicle_id, tag_id, plaza_id, amount_due, created_at
+        )
+        SELECT gen_random_uuid(), %(vehicle_id)s, %(tag_id)s, %(plaza_id)s, %(toll)s, NOW()
+        WHERE NOT EXISTS (
+            SELECT 1 FROM pending_toll_ledger
+            WHERE vehicle_id = %(vehicle_id)s AND plaza_id = %(plaza_id)s AND resolved = FALSE
+        )
+    """, {"vehicle_id": vehicle_id, "tag_id": tag_id, "plaza_id": plaza_id, "toll": toll})
+    return cur.rowcount == 1
+
+
+class TollRepository:
+    """
+        Storage operations the toll decision path needs, independent of where the toll
+        data model lives. toll_logic only talks to this interface; PostgresRepository
+        maps it onto the live tables and caches, InMemoryRepository keeps everything in
+        dicts for benchmarks and database-free tests.
+    """
+
+    # ---- reference data ----
+    def plaza_exists(self, plaza_id):
+        raise NotImplementedError
+
+    def toll_rate(self, vehicle_type):
+        raise NotImplementedError
+
+    # ---- vehicles, tags, accounts ----
+    def toll_context(self, license_plate=None, tag_id=None):
+        """Dict with the TOLL_CONTEXT_COLUMNS keys (ord aside); missing entities are None."""
+        raise NotImplementedError
+
+    # ---- watchlists ----
+    def security_check(self, license_plate, tag_id):
+        """Status dict as returned by run_security_checks, raising the matching alert."""
+        raise NotImplementedError
+
+    # ---- transactions and the pending ledger ----
+    def debit_if_funded(self, account_id, tag_id, amount, plaza_id):
+        """{"paid": bool, "balance": float}, or None when the account is missing or inactive."""
+        raise NotImplementedError
+
+    def record_pending_toll(self, vehicle_id, tag_id, plaza_id, amount):
+        """True when a new unresolved entry was written for (vehicle, plaza)."""
+        raise NotImplementedError
+
+    # ---- notifications and security records ----
+    def create_notification(self, notif_type, message, priority, vehicle_id=None, plaza_id=None):
+        raise NotImplementedError
+
+    def security_alert(self, alert_type, priority, plaza_id=None):
+        raise NotImplementedError
+
+    def security_incident(self, incident_type, location, severity):
+        raise NotImplementedError
+
+
+class PostgresRepository(TollRepository):
+    """
+        TollRepository over one psycopg2 cursor plus the shared in-process caches.
+        With a UnitOfWork, money-moving writes mark the transaction as financial.
+    """
+
+    def __init__(self, cur, uow=None):
+        self.cur = cur
+        self.uow = uow
+
+    def _financial(self):
+        if self.uow is not None:
+            self.uow.mark_financial()
+
+    def plaza_exists(self, plaza_id):
+        return reference_cache.plaza_exists(plaza_id, self.cur)
+
+    def toll_rate(self, vehicle_type):
+        return reference_cache.toll_rate(vehicle_type, self.cur)
+
+    def toll_context(self, license_plate=None, tag_id=None):
+        return fetch_toll_context(self.cur, None, license_plate, tag_id)
+
+    def security_check(self, license_plate, tag_id):
+        return run_security_checks(self.cur, license_plate, tag_id)
+
+    def debit_if_funded(self, account_id, tag_id, amount, plaza_id):
+        if group_commit_enabled:
+            # Committed durably by the writer before it returns, outside our uow: rolling
+            # the uow back afterwards does not undo the charge
+            return group_commit.debit_if_funded(account_id, tag_id, amount, plaza_id)
+        debit = deduct_toll_if_funded(self.cur, account_id, tag_id, amount, plaza_id)
+        if debit and debit["paid"]:
+            self._financial()
+        return debit
+
+    def record_pending_toll(self, vehicle_id, tag_id, plaza_id, amount):
+        recorded = record_pending_toll(self.cur, vehicle_id, tag_id, plaza_id, amount)
+        if recorded:
+            self._financial()
+        return recorded
+
+    def create_notification(self, notif_type, message, priority, vehicle_id=None, plaza_id=None):
+        create_notification(self.cur, notif_type, message, priority, vehicle_id=vehicle_id, plaza_id=plaza_id)
+
+    def security_alert(self, alert_type, priority, plaza_id=None):
+        trigger_security_alert(self.cur, alert_type, priority, plaza_id=plaza_id)
+
+    def security_incident(self, incident_type, location, severity):
+        escalate_security_incident(self.cur, incident_type, location, severity)
+
+
+@contextmanager
+def postgres_repository(async_commit=None):
+    """PostgresRepository whose writes form one unit of work, committed on exit."""
+    with unit_of_work(async_commit) as uow:
+        yield PostgresRepository(uow.cur, uow)
+
+
+class InMemoryRepository(TollRepository):
+    """
+        The toll data model in plain dicts, with the same semantics as the PostgreSQL
+        backend: tag-over-plate resolution, active tags and accounts only, atomic
+        check-and-debit, one open ledger entry per vehicle and plaza, and fingerprint
+        de-duplication of notifications. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.plazas = set()
+        self.rates = {}                 # vehicle_type -> base_cost
+        self.vehicles = {}              # vehicle_id -> {license_plate, vehicle_type, owner_id}
+        self.plates = {}                # license_plate -> vehicle_id
+        self.tags = {}                  # tag_id -> {"vehicle_id", "is_active"}
+        self.vehicle_tags = {}          # vehicle_id -> [tag_id] in insertion order
+        self.accounts = {}              # account_id -> {"owner_id", "balance", "is_active"}
+        self.owner_accounts = {}        # owner_id -> account_id
+        self.blacklisted = {}           # tag_id -> (reason, severity)
+        self.stolen = {}                # license_plate -> (reported_date, agency)
+        self.transactions = []
+        self.pending = {}               # (vehicle_id, plaza_id) -> open ledger entry
+        self.notifications = []
+        self.fingerprints = set()
+        self.alerts = []
+        self.incidents = []
+
+    # ---- loading ----
+
+    def add_plaza(self, plaza_id):
+        self.plazas.add(plaza_id)
+
+    def add_vehicle_type(self, type_code, base_cost):
+        self.rates[type_code] = base_cost
+
+    def add_account(self, owner_id, balance, account_id=None, is_active=True):
+        account_id = account_id or str(uuid.uuid4())
+        self.accounts[account_id] = {"owner_id": owner_id, "balance": balance, "is_active": is_active}
+        self.owner_accounts[owner_id] = account_id
+        return account_id
+
+    def add_vehicle(self, license_plate, vehicle_type, owner_id, vehicle_id=None):
+        vehicle_id = vehicle_id or str(uuid.uuid4())
+        self.vehicles[vehicle_id] = {"license_plate": license_plate, "vehicle_type": vehicle_type, "owner_id": owner_id}
+        if license_plate:
+            self.plates[license_plate] = vehicle_id
+        return vehicle_id
+
+    def add_tag(self, tag_id, vehicle_id, is_active=True):
+        self.tags[tag_id] = {"vehicle_id": vehicle_id, "is_active": is_active}
+        self.vehicle_tags.setdefault(vehicle_id, []).append(tag_id)
+
+    def blacklist_tag(self, tag_id, reason, severity):
+        self.blacklisted.setdefault(tag_id, (reason, severity))
+
+    def report_stolen(self, license_plate, reported_date=None, agency=None):
+        self.stolen.setdefault(license_plate, (reported_date, agency))
+
+    # ---- TollRepository ----
+
+    def plaza_exists(self, plaza_id):
+        return plaza_id in self.plazas
+
+    def toll_rate(self, vehicle_type):
+        return self.rates.get(vehicle_type)
+
+    def _active_tag(self, vehicle_id):
+        for tag_id in self.vehicle_tags.get(vehicle_id, ()):
+            if self.tags[tag_id]["is_active"]:
+                return tag_id
+        return None
+
+    def toll_context(self, license_plate=None, tag_id=None):
+        vehicle_id = None
+        if tag_id:
+            tag = self.tags.get(tag_id)
+            if tag and tag["is_active"]:
+                vehicle_id = tag["vehicle_id"]
+        else:
+            vehicle_id = self.plates.get(license_plate)
+            tag_id = self._active_tag(vehicle_id) if vehicle_id else None
+
+        vehicle = self.vehicles.get(vehicle_id)
+        if vehicle is None:
+            return dict.fromkeys(TOLL_CONTEXT_COLUMNS[1:])
+
+        account_id = self.owner_accounts.get(vehicle["owner_id"])
+        if account_id and not self.accounts[account_id]["is_active"]:
+            account_id = None
+        return {
+            "vehicle_id": vehicle_id,
+            "license_plate": vehicle["license_plate"],
+            "vehicle_type": vehicle["vehicle_type"],
+            "owner_id": vehicle["owner_id"],
+            "tag_id": tag_id,
+            "account_id": account_id,
+        }
+
+    def security_check(self, license_plate, tag_id):
+        stolen = self.stolen.get(license_plate)
+        blacklisted = None if stolen else self.blacklisted.get(tag_id)
+        verdict, alert = classify_security(license_plate, tag_id, stolen, blacklisted)
+        if alert:
+            self.create_notification(*alert)
+        return verdict
+
+    def debit_if_funded(self, account_id, tag_id, amount, plaza_id):
+        with self._lock:
+            account = self.accounts.get(account_id)
+            if account is None or not account["is_active"]:
+                return None
+            if account["balance"] < amount:
+                return {"paid": False, "balance": account["balance"]}
+            account["balance"] -= amount
+            self.transactions.append({
+                "transaction_id": str(uuid.uuid4()), "timestamp": datetime.now(), "amount": amount,
+                "status": "SUCCESS", "rfid_tag_id": tag_id, "plaza_id": plaza_id,
+            })
+            return {"paid": True, "balance": account["balance"]}
+
+    def record_pending_toll(self, vehicle_id, tag_id, plaza_id, amount):
+        with self._lock:
+            if (vehicle_id, plaza_id) in self.pending:
+                return False
+            self.pending[(vehicle_id, plaza_id)] = {
+                "ledger_id": str(uuid.uuid4()), "vehicle_id": vehicle_id, "tag_id": tag_id,
+                "plaza_id": plaza_id, "amount_due": amount, "created_at": datetime.now(),
+            }
+            return True
+
+    def create_notification(self, notif_type, message, priority, vehicle_id=None, plaza_id=None):
+        key = (notification_fingerprint(notif_type, priority, message, vehicle_id, plaza_id), dedup_bucket())
+        with self._lock:
+            if key in self.fingerprints:
+                return
+            self.fingerprints.add(key)
+            self.notifications.append({
+                "message": message, "timestamp": datetime.now(), "type": notif_type, "priority": priority,
+                "status": "unread", "vehicle_id": vehicle_id, "plaza_id": plaza_id,
+            })
+        alert_logger.info("NOTIFICATION [%s] | %s", notif_type, message)
+
+    def security_alert(self, alert_type, priority, plaza_id=None):
+        with self._lock:
+            self.alerts.append((alert_type, priority, datetime.now()))
+
+    def security_incident(self, incident_type, location, severity):
+        with self._lock:
+            self.incidents.append((incident_type, location, severity, datetime.now()))
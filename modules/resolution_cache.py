@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+from modules.settings import load_settings
+
+
+class ResolutionCache:
+    """
+        Bounded LRU cache with a TTL for vehicle / tag resolution.
+        Entries are keyed by ("plate", plate) or ("tag", tag_id) and hold one value per
+        lookup kind, so invalidating a plate or a tag drops every cached answer about it.
+        An entry can also name the rows its answer was derived from (refs such as
+        ("account", account_id)); invalidate_refs drops every entry built on one of them,
+        whatever plate or tag it is keyed by.
+        Only positive answers are cached; unknown plates keep going to the database.
+    """
+
+    def __init__(self, max_size=100000, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (by, key) -> (expires_at, {kind: value}, refs)
+        self._refs = {}                 # ref -> {(by, key)}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _pop(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            for ref in entry[2]:
+                keys = self._refs.get(ref)
+                if keys is not None:
+                    keys.discard(entry_key)
+                    if not keys:
+                        del self._refs[ref]
+        return entry
+
+    def get(self, kind, by, key):
+        """Returns (found, value)."""
+        with self._lock:
+            entry = self._entries.get((by, key))
+            if entry is not None:
+                expires_at, values, _ = entry
+                if expires_at < time.monotonic():
+                    self._pop((by, key))
+                    self._stats["expirations"] += 1
+                elif kind in values:
+                    self._entries.move_to_end((by, key))
+                    self._stats["hits"] += 1
+                    return True, values[kind]
+            self._stats["misses"] += 1
+            return False, None
+
+    def put(self, kind, by, key, value, refs=()):
+        with self._lock:
+            entry = self._entries.get((by, key))
+            if entry is None:
+                entry = (time.monotonic() + self.ttl, {}, set())
+                self._entries[(by, key)] = entry
+            else:
+                self._entries.move_to_end((by, key))
+            entry[1][kind] = value
+            for ref in refs:
+                if ref[1] is not None:
+                    entry[2].add(ref)
+                    self._refs.setdefault(ref, set()).add((by, key))
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def lookup(self, kind, by, key, load, refs=None):
+        """
+            Cached value for (kind, by, key), calling load() on a miss. refs(value) names
+            the rows a loaded value was derived from (see invalidate_refs).
+        """
+        found, value = self.get(kind, by, key)
+        if found:
+            return value
+        value = load()
+        if value is not None:
+            self.put(kind, by, key, value, refs(value) if refs else ())
+        return value
+
+    def invalidate(self, license_plate=None, tag_id=None):
+        with self._lock:
+            for by, key in (("plate", license_plate), ("tag", tag_id)):
+                if key is not None and self._pop((by, key)) is not None:
+                    self._stats["invalidations"] += 1
+        if tag_id is not None:
+            # Plate-keyed answers that resolved to this tag
+            self.invalidate_refs(("tag", tag_id))
+
+    def invalidate_refs(self, *refs):
+        """Drop every entry derived from any of refs, e.g. ("account", account_id)."""
+        with self._lock:
+            for ref in refs:
+                for entry_key in list(self._refs.get(ref, ())):
+                    if self._pop(entry_key) is not None:
+                        self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._refs.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "refs": len(self._refs), "max_size": self.max_size,
+                    "ttl": self.ttl, **self._stats}
+
+
+_settings = load_settings("RESOLUTION_CACHE")
+resolution_cache = ResolutionCache(
+    max_size=_settings.getint("max_size", fallback=100000),
+    ttl=_settings.getfloat("ttl", fallback=300.0)
+)
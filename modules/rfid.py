@@ -1,13 +1,18 @@
 from datetime import datetime, timedelta
+from modules.watchlist import watchlist
+from modules.resolution_cache import resolution_cache
 
 def get_active_rfid(cur, license_plate):
-    cur.execute("""
-        SELECT r.tag_id
-        FROM rfid_tags r
-        JOIN vehicles v ON r.vehicle_id = v.vehicle_id
-        WHERE v.license_plate = %s AND r.is_active = TRUE
-    """, (license_plate,))
-    return cur.fetchone()
+    def load():
+        cur.execute("""
+            SELECT r.tag_id, r.vehicle_id
+            FROM rfid_tags r
+            JOIN vehicles v ON r.vehicle_id = v.vehicle_id
+            WHERE v.license_plate = %s AND r.is_active = TRUE
+        """, (license_plate,))
+        return cur.fetchone()
+    return resolution_cache.lookup("active_tag", "plate", license_plate, load,
+                                   refs=lambda row: (("tag", row[0]), ("vehicle", row[1])))
 
 
 
@@ -30,6 +35,9 @@ def assign_rfid_to_vehicle(cur, tag_id, license_plate, issue_date=None, expiry_d
         VALUES (%s, TRUE, %s, %s, %s)
     """, (tag_id, issue_date, expiry_date, vehicle_id))
 
+    # The plate's active tag changed, drop whatever was cached for either side
+    resolution_cache.invalidate(license_plate=license_plate, tag_id=tag_id)
+
     return tag_id
 
 
@@ -45,3 +53,6 @@ def blacklist_tag(cur, tag_id, reason, severity, reporter="System"):
         INSERT INTO blacklisted_rfid (tag_id, reason, blacklistedDate, reportedBy, severity)
         VALUES (%s, %s, %s, %s, %s)
     """, (tag_id, reason, datetime.now(), reporter, severity))
+    # Flag the tag for this process right away, the NOTIFY trigger covers the others
+    watchlist.add_blacklisted_tag(tag_id, reason, severity)
+    resolution_cache.invalidate(tag_id=tag_id)
@@ -1,5 +1,7 @@
 from datetime import datetime
 from modules.logger import alert_logger
+from modules.db_pool import after_commit
+from modules.event_bus import event_bus
 
 def escalate_security_incident(cur, incident_type, location, severity, reporter="System"):
     timestamp = datetime.now()
@@ -8,17 +10,29 @@ def escalate_security_incident(cur, incident_type, location, severity, reporter=
     cur.execute("""
         INSERT INTO security_incidents (incident_type, timestamp, location, severity, reported_by, status)
         VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING incident_id
     """, (incident_type, timestamp, location, severity, reporter, status))
+    incident_id = cur.fetchone()[0]
+    after_commit(cur.connection, lambda: event_bus.publish("security_incident", {
+        "incident_id": incident_id, "type": incident_type, "timestamp": timestamp, "location": location,
+        "severity": severity, "reported_by": reporter, "status": status,
+    }, event_type=incident_type, priority=severity, plaza_id=location))
 
     alert_logger.warning(f"[SECURITY INCIDENT] {incident_type} | Severity: {severity} | Location: {location}")
 
-def trigger_security_alert(cur, alert_type, priority, status="ACTIVE"):
+def trigger_security_alert(cur, alert_type, priority, status="ACTIVE", plaza_id=None):
+    # security_alerts has no plaza column; plaza_id only routes the streamed event
     timestamp = datetime.now()
 
     cur.execute("""
         INSERT INTO security_alerts (alert_type, priority, timestamp, status)
         VALUES (%s, %s, %s, %s)
+        RETURNING alert_id
     """, (alert_type, priority, timestamp, status))
+    alert_id = cur.fetchone()[0]
+    after_commit(cur.connection, lambda: event_bus.publish("security_alert", {
+        "alert_id": alert_id, "type": alert_type, "priority": priority, "timestamp": timestamp, "status": status,
+    }, event_type=alert_type, priority=priority, plaza_id=plaza_id))
 
     alert_logger.warning(f"[SECURITY ALERT] Type: {alert_type} | Priority: {priority} | Status: {status}")
 
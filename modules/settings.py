@@ -0,0 +1,13 @@
+import configparser
+
+
+def load_settings(section, path="configs/system.ini"):
+    """
+        Return one section of system.ini. A missing section falls back to the (empty)
+        DEFAULT section, so callers can always use getint/getfloat/getboolean with a fallback.
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    if config.has_section(section):
+        return config[section]
+    return config[config.default_section]
@@ -0,0 +1,158 @@
+import argparse
+import time
+
+from modules.db_pool import unit_of_work
+from modules.logger import txn_logger
+from modules.metrics import instrumented
+from modules.settings import load_settings
+
+# Settles outstanding pending_toll_ledger rows against whatever balance each locked
+# account has after the credit, oldest first: a running sum over the account's unpaid
+# rows marks the longest prefix the balance covers. Ledger rows are resolved, the
+# matching toll_transactions are written and the account is updated exactly once, all
+# in one statement. The acct CTE (one account, or a batch of funded ones) is spliced in.
+SETTLE_SQL = """
+    WITH acct AS ({accounts}),
+    outstanding AS (
+        SELECT
+            l.ledger_id, l.tag_id, l.plaza_id, l.amount_due::double precision AS amount_due,
+            acct.account_id, acct.available,
+            SUM(l.amount_due::double precision) OVER (
+                PARTITION BY acct.account_id ORDER BY l.created_at, l.ledger_id
+            ) AS running_total
+        FROM acct
+        JOIN vehicles v ON v.owner_id = acct.owner_id
+        JOIN pending_toll_ledger l ON l.vehicle_id = v.vehicle_id
+        WHERE l.resolved = FALSE AND l.amount_due IS NOT NULL
+    ),
+    resolved AS (
+        UPDATE pending_toll_ledger l
+        SET resolved = TRUE
+        FROM outstanding o
+        WHERE l.ledger_id = o.ledger_id AND o.running_total <= o.available
+          -- Re-checked on the current row version: never settle a row another
+          -- settlement resolved after this statement's snapshot was taken
+          AND l.resolved = FALSE
+        RETURNING o.account_id, o.tag_id, o.plaza_id, o.amount_due
+    ),
+    txn AS (
+        INSERT INTO toll_transactions (
+            transaction_id, timestamp, amount, distance, status, security_flag, rfid_tag_id, plaza_id
+        )
+        SELECT gen_random_uuid(), NOW(), r.amount_due, 15.0, 'SETTLED', FALSE, r.tag_id, r.plaza_id
+        FROM resolved r
+    ),
+    settled AS (
+        SELECT account_id, COUNT(*) AS tolls, SUM(amount_due) AS amount
+        FROM resolved
+        GROUP BY account_id
+    ),
+    balance AS (
+        UPDATE accounts a
+        SET balance = acct.available - COALESCE(s.amount, 0)
+        FROM acct
+        LEFT JOIN settled s ON s.account_id = acct.account_id
+        WHERE a.account_id = acct.account_id AND (acct.credit <> 0 OR s.account_id IS NOT NULL)
+        RETURNING a.account_id, a.balance
+    )
+    SELECT acct.account_id, COALESCE(b.balance, acct.available), COALESCE(s.tolls, 0), COALESCE(s.amount, 0)
+    FROM acct
+    LEFT JOIN balance b ON b.account_id = acct.account_id
+    LEFT JOIN settled s ON s.account_id = acct.account_id
+    ORDER BY acct.account_id
+"""
+
+TOP_UP_SQL = SETTLE_SQL.format(accounts="""
+        SELECT account_id, owner_id, balance + %(amount)s AS available, %(amount)s AS credit
+        FROM accounts
+        WHERE account_id = %(account_id)s AND is_active = TRUE
+        FOR UPDATE
+""")
+
+# Active accounts with money and at least one unpaid toll, in account_id order after the
+# previous batch. SKIP LOCKED leaves accounts busy in a live toll decision to the next run.
+BULK_SETTLE_SQL = SETTLE_SQL.format(accounts="""
+        SELECT a.account_id, a.owner_id, a.balance AS available, 0 AS credit
+        FROM accounts a
+        WHERE a.is_active = TRUE AND a.balance > 0 AND a.account_id > %(after)s
+          AND EXISTS (
+              SELECT 1 FROM vehicles v
+              JOIN pending_toll_ledger l ON l.vehicle_id = v.vehicle_id
+              WHERE v.owner_id = a.owner_id AND l.resolved = FALSE
+          )
+        ORDER BY a.account_id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+""")
+
+_settings = load_settings("SETTLEMENT")
+BULK_BATCH_ACCOUNTS = _settings.getint("bulk_batch_accounts", fallback=500)
+
+
+@instrumented("settlement", "top_up")
+def top_up_account(cur, account_id, amount):
+    """
+        Credit the account and settle as many of its owner's unpaid tolls as the new
+        balance covers. Returns {"account_id", "balance", "settled_tolls", "settled_amount"},
+        or None when the account is missing or inactive.
+    """
+    # Lock first, in a statement of its own: after waiting out a concurrent settlement
+    # of this account, TOP_UP_SQL then starts from a snapshot that includes its work
+    cur.execute("""
+        SELECT 1 FROM accounts
+        WHERE account_id = %s AND is_active = TRUE
+        FOR UPDATE
+    """, (account_id,))
+    if cur.fetchone() is None:
+        return None
+    cur.execute(TOP_UP_SQL, {"account_id": account_id, "amount": amount})
+    row = cur.fetchone()
+    if row is None:
+        return None
+    account_id, balance, tolls, settled = row
+    return {"account_id": account_id, "balance": balance, "settled_tolls": tolls, "settled_amount": settled}
+
+
+@instrumented("settlement", "bulk_batch")
+def settle_funded_batch(cur, after="", limit=BULK_BATCH_ACCOUNTS):
+    """
+        One bulk settlement batch; returns (account_id, balance, tolls, amount) for every
+        account it locked, including those whose balance covered nothing yet.
+    """
+    cur.execute(BULK_SETTLE_SQL, {"after": after, "limit": limit})
+    return cur.fetchall()
+
+
+def settle_funded_accounts(batch_accounts=BULK_BATCH_ACCOUNTS):
+    """
+        Nightly bulk mode: settle every funded account with unpaid tolls, batch_accounts
+        accounts per transaction so row locks are held briefly.
+    """
+    started = time.perf_counter()
+    summary = {"batches": 0, "accounts": 0, "settled_tolls": 0, "settled_amount": 0.0}
+    after = ""
+    while True:
+        with unit_of_work() as uow:
+            rows = settle_funded_batch(uow.cur, after, batch_accounts)
+            if rows:
+                uow.mark_financial()
+        if not rows:
+            break
+        after = rows[-1][0]
+        summary["batches"] += 1
+        summary["accounts"] += sum(1 for row in rows if row[2])
+        summary["settled_tolls"] += sum(row[2] for row in rows)
+        summary["settled_amount"] += sum(row[3] for row in rows)
+        if len(rows) < batch_accounts:
+            break
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    txn_logger.info("Bulk settlement finished: %s", summary)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Settle unpaid tolls of every funded account (nightly job).")
+    parser.add_argument("--batch-accounts", type=int, default=BULK_BATCH_ACCOUNTS)
+    args = parser.parse_args()
+    print(settle_funded_accounts(args.batch_accounts))
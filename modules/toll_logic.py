@@ -1,151 +1,297 @@
-from modules.sql import (
-    get_vehicle,
-    get_active_rfid,
-    run_security_checks,
-    get_toll_rate,
-    get_account,
-    deduct_toll,
-    get_vehicle_id_by_plate,
-    get_vehicle_id_by_tag,
-    create_notification,
-    escalate_security_incident,
-    trigger_security_alert,
-    get_connection
-)
+from psycopg2.extras import execute_values
+
+from modules.db_pool import unit_of_work
+from modules.reference_cache import reference_cache
+from modules.repository import PostgresRepository, fetch_toll_contexts
 from modules.logger import alert_logger, txn_logger, general_logger
+from modules.metrics import instrumented_decision, timed
 from modules.notification import is_valid_uuid
 
 
-def process_toll_flexible(plaza_id: str, license_plate: str = None, tag_id: str = None):
-    """ 
+MAX_BATCH_EVENTS = 1000
+
+
+def invalid_plaza(plaza_id):
+    general_logger.warning("Invalid toll plaza: %s", plaza_id)
+    return {
+        "status": "INVALID_PLAZA",
+        "message": f"Toll plaza {plaza_id} does not exist."
+    }
+
+
+def evaluate_passage(repo, ctx, plaza_id, license_plate=None, tag_id=None):
+    """
+        Apply every rule that precedes the debit to a fetched toll context, raising
+        notifications and alerts through the repository.
+        Returns (result, None) when the passage ends here, or (None, charge) when the
+        vehicle is clear to be charged.
+    """
+    vehicle_id = ctx["vehicle_id"]
+    vehicle_type = ctx["vehicle_type"]
+    owner_id = ctx["owner_id"]
+
+    # Case A: Tag provided
+    if tag_id:
+        general_logger.info("Resolved vehicle_id from tag %s: %s", tag_id, vehicle_id)
+        if not vehicle_id:
+            repo.create_notification("UNKNOWN_TAG", f"Unknown or inactive tag {tag_id}", "HIGH", plaza_id=plaza_id)
+            return {"status": "UNKNOWN_TAG"}, None
+
+        license_plate = ctx["license_plate"]
+        general_logger.info("Resolved vehicle from tag: Plate=%s, Type=%s, Owner=%s", license_plate, vehicle_type, owner_id)
+
+        # License plate missing in DB after tag resolution (data inconsistency)
+        if not license_plate:
+            repo.create_notification("LICENSE_MISSING", f"Missing license plate for tag {tag_id}", "HIGH", vehicle_id=vehicle_id, plaza_id=plaza_id)
+            return {"status": "LICENSE_MISSING"}, None
+
+    # Case B: Only license plate
+    else:
+        if not vehicle_id:
+            repo.create_notification("UNMATCHED_PLATE", f"Unknown vehicle {license_plate}", "HIGH", plaza_id=plaza_id)
+            return {"status": "UNMATCHED_PLATE"}, None
+
+        general_logger.info("Resolved vehicle from plate: ID=%s, Type=%s, Owner=%s", vehicle_id, vehicle_type, owner_id)
+        tag_id = ctx["tag_id"]
+        if not tag_id:
+            general_logger.warning("No active RFID tag found for %s at plaza %s", license_plate, plaza_id)
+            repo.create_notification(
+                "TAG_MISSING", f"Missing or inactive RFID on {license_plate}", "MEDIUM",
+                vehicle_id=vehicle_id, plaza_id=plaza_id
+            )
+            return {"status": "TAG_MISSING"}, None
+        general_logger.info("Active tag_id found: %s for plate %s", tag_id, license_plate)
+
+    # Defensive check: UUID validity
+    if not is_valid_uuid(vehicle_id):
+        general_logger.error("Invalid vehicle_id: %s for plate %s at plaza %s", vehicle_id, license_plate, plaza_id)
+        return {"status": "ERROR", "message": f"vehicle_id not a UUID: {vehicle_id}"}, None
+
+    # Step 3: Security (in-memory watchlist, no round trip for clean vehicles)
+    security = repo.security_check(license_plate, tag_id)
+    if security["status"] != "CLEAR":
+        reason = security.get("reason", "N/A")
+        alert_logger.warning("Security flagged %s → %s", license_plate, security['status'])
+        repo.create_notification(security["status"], f"{license_plate} flagged: {reason}", "CRITICAL", vehicle_id=vehicle_id, plaza_id=plaza_id)
+        repo.security_alert(security["status"], "HIGH", plaza_id)
+        repo.security_incident(f"{security['status']} Detected", plaza_id, "HIGH")
+        return {"status": security["status"], "details": reason}, None
+
+    # Step 4: Toll rate
+    toll = repo.toll_rate(vehicle_type)
+    if toll is None:
+        return {"status": "NO_RATE", "message": f"No toll rate for vehicle type {vehicle_type}"}, None
+    general_logger.info("Toll amount for %s: %s", vehicle_type, toll)
+
+    # Step 5: Account
+    account_id = ctx["account_id"]
+    if not account_id:
+        return {"status": "ACCOUNT_MISSING"}, None
+    general_logger.info("Account found: ID=%s", account_id)
+
+    return None, {
+        "vehicle_id": vehicle_id,
+        "license_plate": license_plate,
+        "tag_id": tag_id,
+        "account_id": account_id,
+        "toll": toll,
+    }
+
+
+def insufficient_funds(repo, charge, balance, plaza_id, record_ledger=True):
+    toll, license_plate = charge["toll"], charge["license_plate"]
+    general_logger.warning("Insufficient balance for %s at plaza %s (Balance: %s, Required: %s)", license_plate, plaza_id, balance, toll)
+    repo.create_notification("LOW_BALANCE", f"Insufficient balance for toll {toll} - Vehicle: {license_plate}", "HIGH", vehicle_id=charge["vehicle_id"], plaza_id=plaza_id)
+
+    if record_ledger and repo.record_pending_toll(charge["vehicle_id"], charge["tag_id"], plaza_id, toll):
+        general_logger.info("Pending toll recorded for %s at plaza %s", license_plate, plaza_id)
+
+    return {"status": "INSUFFICIENT_FUNDS", "required": toll, "balance": balance}
+
+
+def decide_toll(repo, plaza_id, license_plate=None, tag_id=None):
+    """Full toll decision for one passage against any TollRepository."""
+    if not repo.plaza_exists(plaza_id):
+        return invalid_plaza(plaza_id)
+
+    # PostgreSQL round trip 1: vehicle, tag and account together (none for a cached passage)
+    with timed("toll", "vehicle_lookup"):
+        ctx = repo.toll_context(license_plate, tag_id)
+    with timed("toll", "evaluate"):
+        result, charge = evaluate_passage(repo, ctx, plaza_id, license_plate, tag_id)
+    if result:
+        return result
+
+    # PostgreSQL round trip 2: conditional debit + transaction row in one statement, so two
+    # lanes charging the same owner can never both pass the balance check
+    account_id, toll = charge["account_id"], charge["toll"]
+    with timed("toll", "debit"):
+        debit = repo.debit_if_funded(account_id, charge["tag_id"], toll, plaza_id)
+    if debit is None:
+        return {"status": "ACCOUNT_MISSING"}
+    if debit["paid"]:
+        txn_logger.info("Toll of %s deducted from account %s", toll, account_id)
+        return {"status": "TOLL_PAID", "amount": toll}
+
+    with timed("toll", "insufficient_funds"):
+        return insufficient_funds(repo, charge, debit["balance"], plaza_id)
+
+
+@instrumented_decision("toll")
+def process_toll_flexible(plaza_id: str, license_plate: str = None, tag_id: str = None, repository=None):
+    """
         Process toll payment based on either license plate or RFID tag.
+        Runs against PostgreSQL unless a TollRepository is passed in.
         Returns a dictionary with status and details.
     """
     general_logger.info("Toll Process Started...")
     try:
         if not plaza_id:
             return {"status": "ERROR", "message": "Toll plaza ID is required"}
-        general_logger.info("Processing toll for Plaza ID:", plaza_id)
-
-        conn = get_connection()
-        conn.autocommit = True
-        with conn.cursor() as cur:
-            # 🔍 Validate plaza_id first
-            cur.execute("SELECT 1 FROM toll_plazas WHERE plaza_id = %s", (plaza_id,))
-            if not cur.fetchone():
-                general_logger.warning(f"Invalid toll plaza: {plaza_id}")
-                return {
-                    "status": "INVALID_PLAZA",
-                    "message": f"Toll plaza {plaza_id} does not exist."
-                }
-
-            vehicle_id = None
-            vehicle_type = None
-            owner_id = None
-
-            # Case A: Tag provided
-            if tag_id:
-                general_logger.info(f"Processing toll for TAG_ID: {tag_id}")
-                vehicle_id = get_vehicle_id_by_tag(cur, tag_id)
-                general_logger.info(f"Resolved vehicle_id from tag: {vehicle_id}")
-
-                if not vehicle_id:
-                    create_notification(cur, "UNKNOWN_TAG", f"Unknown or inactive tag {tag_id}", "HIGH", plaza_id=plaza_id)
-                    return {"status": "UNKNOWN_TAG"}
-
-                cur.execute("SELECT license_plate, vehicle_type, owner_id FROM vehicles WHERE vehicle_id = %s", (vehicle_id,))
-                result = cur.fetchone()
-                if not result:
-                    return {"status": "ERROR", "message": "Vehicle not found for tag"}
-                
-                license_plate, vehicle_type, owner_id = result
-                general_logger.info(f"Resolved vehicle from tag: Plate={license_plate}, Type={vehicle_type}, Owner={owner_id}")
-
-                # License plate missing in DB after tag resolution (data inconsistency)
-                if not license_plate:
-                    create_notification(cur, "LICENSE_MISSING", f"Missing license plate for tag {tag_id}", "HIGH", vehicle_id=vehicle_id, plaza_id=plaza_id)
-                    return {"status": "LICENSE_MISSING"}
-
-            # Case B: Only license plate
-            elif license_plate:
-                general_logger.info(f"Processing toll for LICENSE_PLATE: {license_plate}")
-                vehicle = get_vehicle(cur, license_plate)
-                if not vehicle:
-                    create_notification(cur, "UNMATCHED_PLATE", f"Unknown vehicle {license_plate}", "HIGH", plaza_id=plaza_id)
-                    return {"status": "UNMATCHED_PLATE"}
-
-                vehicle_id, vehicle_type, owner_id = vehicle
-                general_logger.info(f"Resolved vehicle from plate: ID={vehicle_id}, Type={vehicle_type}, Owner={owner_id}")
-                if not tag_id:
-                    tag = get_active_rfid(cur, license_plate)
-                    if not tag:
-                        general_logger.warning(f"No active RFID tag found for {license_plate} at plaza {plaza_id}")
-                        create_notification(
-                            cur, "TAG_MISSING", f"Missing or inactive RFID on {license_plate}", "MEDIUM",
-                            vehicle_id=vehicle_id, plaza_id=plaza_id
-                        )
-                        return {"status": "TAG_MISSING"}
-                    tag_id = tag[0]
-                    general_logger.info(f"Active tag_id found: {tag_id} for plate {license_plate}")
-
-            # Defensive check: UUID validity
-            if not is_valid_uuid(vehicle_id):
-                general_logger.error(f"Invalid vehicle_id: {vehicle_id} for plate {license_plate} at plaza {plaza_id}")
-                print(f"vehicle_id is not a valid UUID → {vehicle_id}")
-                return {"status": "ERROR", "message": f"vehicle_id not a UUID: {vehicle_id}"}
-
-            # Step 3: Security
-            general_logger.info(f"Running security checks for Plate={license_plate}, Tag={tag_id}")
-            security = run_security_checks(cur, license_plate, tag_id)
-            if security["status"] != "CLEAR":
-                reason = security.get("reason", "N/A")
-                alert_logger.warning(f"Security flagged {license_plate} → {security['status']}")
-                create_notification(cur, security["status"], f"{license_plate} flagged: {reason}", "CRITICAL", vehicle_id=vehicle_id, plaza_id=plaza_id)
-                trigger_security_alert(cur, security["status"], "HIGH")
-                escalate_security_incident(cur, f"{security['status']} Detected", plaza_id, "HIGH")
-                return {"status": security["status"], "details": reason}
-
-            # Step 4: Toll rate
-            general_logger.info(f"Fetching vehicle type for {license_plate} (ID: {vehicle_id})")
-            toll_row = get_toll_rate(cur, vehicle_type)
-            if not toll_row:
-                return {"status": "NO_RATE", "message": f"No toll rate for vehicle type {vehicle_type}"}
-            toll = toll_row[0]
-            general_logger.info(f"Toll amount for {vehicle_type}: {toll}")
-
-            # Step 5: Balance check
-            general_logger.info(f"Checking account for owner_id: {owner_id}")
-            account = get_account(cur, owner_id)
-            if not account:
-                return {"status": "ACCOUNT_MISSING"}
-            account_id, balance = account
-            general_logger.info(f"Account found: ID={account_id}, Balance={balance}")
-
-            if balance >= toll:
-                deduct_toll(cur, account_id, tag_id, toll, plaza_id)
-                txn_logger.info(f"Toll of {toll} deducted from account {account_id}")
-                return {"status": "TOLL_PAID", "amount": toll}
-
-            # Insufficient balance
-            general_logger.warning(f"Insufficient balance for {license_plate} at plaza {plaza_id} (Balance: {balance}, Required: {toll})")
-            create_notification(cur, "LOW_BALANCE", f"Insufficient balance for toll {toll} - Vehicle: {license_plate}", "HIGH", vehicle_id=vehicle_id, plaza_id=plaza_id)
-
-            cur.execute("""
-                SELECT 1 FROM pending_toll_ledger
-                WHERE vehicle_id = %s AND plaza_id = %s AND resolved = FALSE
-            """, (vehicle_id, plaza_id))
-            if not cur.fetchone():
-                cur.execute("""
-                    INSERT INTO pending_toll_ledger (
-                        ledger_id, vehicle_id, tag_id, plaza_id, amount_due, created_at
-                    ) VALUES (
-                        gen_random_uuid(), %s, %s, %s, %s, NOW()
-                    )
-                """, (vehicle_id, tag_id, plaza_id, toll))
-                general_logger.info(f"Pending toll recorded for {license_plate} at plaza {plaza_id}")
+        if not license_plate and not tag_id:
+            return {"status": "ERROR", "message": "Either license_plate or tag_id is required"}
+        general_logger.info("Processing toll for Plaza ID: %s", plaza_id)
+
+        if repository is not None:
+            return decide_toll(repository, plaza_id, license_plate, tag_id)
+
+        # 🔍 Validate plaza_id first, straight from the reference cache
+        if not reference_cache.plaza_exists(plaza_id):
+            return invalid_plaza(plaza_id)
 
-            return {"status": "INSUFFICIENT_FUNDS", "required": toll, "balance": balance}
+        # One transaction per decision: a single commit (and WAL flush) per vehicle,
+        # and no half-written notification / ledger state if anything fails
+        with unit_of_work() as uow:
+            return decide_toll(PostgresRepository(uow.cur, uow), plaza_id, license_plate, tag_id)
 
     except Exception as e:
-        alert_logger.error(f"EXCEPTION during toll processing: {str(e)}")
+        alert_logger.error("EXCEPTION during toll processing: %s", str(e))
         return {"status": "ERROR", "message": str(e)}
+
+
+def normalize_batch_event(event):
+    """Accept either a dict or a (plaza_id, license_plate, tag_id, timestamp) sequence."""
+    if isinstance(event, dict):
+        return (event.get("plaza_id"), event.get("license_plate") or event.get("plate"),
+                event.get("tag_id"), event.get("timestamp"))
+    plaza_id, license_plate, tag_id, timestamp = (list(event) + [None] * 4)[:4]
+    return plaza_id, license_plate, tag_id, timestamp
+
+
+def process_toll_batch(events):
+    """
+        Process a replayed buffer of lane events in one database transaction.
+        Vehicles, tags and accounts are resolved with one set-based query, the
+        affected accounts are locked once, and debits, toll_transactions and
+        pending_toll_ledger rows are written in bulk. Returns one result per event, in
+        input order, with the same statuses as process_toll_flexible.
+    """
+    events = [normalize_batch_event(e) for e in events]
+    general_logger.info("Toll batch started: %s events", len(events))
+    results = [None] * len(events)
+
+    # Reject malformed events and unknown plazas up front, they never reach the database
+    valid = []
+    for i, (plaza_id, license_plate, tag_id, _) in enumerate(events):
+        if not plaza_id:
+            results[i] = {"status": "ERROR", "message": "Toll plaza ID is required"}
+        elif not license_plate and not tag_id:
+            results[i] = {"status": "ERROR", "message": "Either license_plate or tag_id is required"}
+        elif not reference_cache.plaza_exists(plaza_id):
+            results[i] = invalid_plaza(plaza_id)
+        else:
+            valid.append(i)
+    if not valid:
+        return results
+
+    try:
+        with unit_of_work() as uow:
+            cur = uow.cur
+            repo = PostgresRepository(cur, uow)
+            contexts = fetch_toll_contexts(cur, [events[i][:3] for i in valid])
+
+            charges = []
+            for i, ctx in zip(valid, contexts):
+                plaza_id, license_plate, tag_id, _ = events[i]
+                results[i], charge = evaluate_passage(repo, ctx, plaza_id, license_plate, tag_id)
+                if charge:
+                    charges.append((i, charge))
+
+            if charges:
+                # Lock every account touched by the batch once, in a stable order
+                cur.execute("""
+                    SELECT account_id, balance FROM accounts
+                    WHERE account_id = ANY(%s) AND is_active = TRUE
+                    ORDER BY account_id
+                    FOR UPDATE
+                """, (sorted({c["account_id"] for _, c in charges}),))
+                balances = dict(cur.fetchall())
+
+                debits = {}
+                paid_rows = []
+                ledger_rows = []
+                pending_seen = set()
+                # Apply charges in input order against the running balance
+                for i, charge in charges:
+                    plaza_id, _, _, timestamp = events[i]
+                    account_id, toll = charge["account_id"], charge["toll"]
+                    if account_id not in balances:
+                        results[i] = {"status": "ACCOUNT_MISSING"}
+                        continue
+                    if balances[account_id] >= toll:
+                        balances[account_id] -= toll
+                        debits[account_id] = debits.get(account_id, 0) + toll
+                        paid_rows.append((timestamp, toll, charge["tag_id"], plaza_id))
+                        results[i] = {"status": "TOLL_PAID", "amount": toll}
+                        continue
+
+                    results[i] = insufficient_funds(repo, charge, balances[account_id], plaza_id, record_ledger=False)
+                    due_key = (charge["vehicle_id"], plaza_id)
+                    if due_key not in pending_seen:
+                        pending_seen.add(due_key)
+                        ledger_rows.append((charge["vehicle_id"], charge["tag_id"], plaza_id, toll, timestamp))
+
+                if debits:
+                    execute_values(cur, """
+                        UPDATE accounts a
+                        SET balance = a.balance - d.total
+                        FROM (VALUES %s) AS d(account_id, total)
+                        WHERE a.account_id = d.account_id
+                    """, list(debits.items()), template="(%s, %s::double precision)", page_size=len(debits))
+
+                if paid_rows:
+                    execute_values(cur, """
+                        INSERT INTO toll_transactions (
+                            transaction_id, timestamp, amount, distance, status, security_flag, rfid_tag_id, plaza_id
+                        ) VALUES %s
+                    """, paid_rows,
+                        template="(gen_random_uuid(), COALESCE(%s::timestamptz, NOW()), %s, 15.0, 'SUCCESS', FALSE, %s, %s)",
+                        page_size=len(paid_rows))
+
+                if ledger_rows:
+                    # One pending entry per vehicle and plaza, as in record_pending_toll
+                    execute_values(cur, """
+                        INSERT INTO pending_toll_ledger (
+                            ledger_id, vehicle_id, tag_id, plaza_id, amount_due, created_at
+                        )
+                        SELECT gen_random_uuid(), d.vehicle_id, d.tag_id, d.plaza_id, d.amount_due,
+                               COALESCE(d.created_at, NOW())
+                        FROM (VALUES %s) AS d(vehicle_id, tag_id, plaza_id, amount_due, created_at)
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM pending_toll_ledger l
+                            WHERE l.vehicle_id = d.vehicle_id AND l.plaza_id = d.plaza_id AND l.resolved = FALSE
+                        )
+                    """, ledger_rows,
+                        template="(%s::uuid, %s::varchar, %s::varchar, %s::numeric, %s::timestamp)",
+                        page_size=len(ledger_rows))
+
+                if paid_rows or ledger_rows:
+                    uow.mark_financial()
+                txn_logger.info("Toll batch charged %s events across %s accounts", len(paid_rows), len(debits))
+
+    except Exception as e:
+        alert_logger.error("EXCEPTION during toll batch processing: %s", str(e))
+        for i in valid:
+            results[i] = {"status": "ERROR", "message": str(e)}
+
+    return results
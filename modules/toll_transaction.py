@@ -1,4 +1,6 @@
 from datetime import datetime, timedelta
+from modules.watchlist import watchlist
+from modules.metrics import instrumented
 
 def get_active_rfid(cur, license_plate):
     cur.execute("""
@@ -30,21 +32,60 @@ def blacklist_tag(cur, tag_id, reason, severity, reporter="System"):
         INSERT INTO blacklisted_rfid (tag_id, reason, blacklistedDate, reportedBy, severity)
         VALUES (%s, %s, %s, %s, %s)
     """, (tag_id, reason, datetime.now(), reporter, severity))
+    watchlist.add_blacklisted_tag(tag_id, reason, severity)
 
 
+@instrumented("deduct_toll")
 def deduct_toll(cur, account_id, tag_id, toll_amount, plaza_id="PLZ001"):
-    # Step 1: Deduct balance
-    cur.execute("""
-        UPDATE accounts
-        SET balance = balance - %s
-        WHERE account_id = %s
-    """, (toll_amount, account_id))
-
-    # Step 2: Record the transaction
+    # Deduct balance and record the transaction in a single statement,
+    # the row is only written if the account was actually debited
     cur.execute("""
+        WITH debit AS (
+            UPDATE accounts
+            SET balance = balance - %s
+            WHERE account_id = %s
+            RETURNING account_id
+        )
         INSERT INTO toll_transactions (
             transaction_id, timestamp, amount, distance, status, security_flag, rfid_tag_id, plaza_id
-        ) VALUES (
-            gen_random_uuid(), NOW(), %s, %s, %s, %s, %s, %s
         )
-    """, (toll_amount, 15.0, 'SUCCESS', False, tag_id, plaza_id))
+        SELECT gen_random_uuid(), NOW(), %s, %s, %s, %s, %s, %s
+        FROM debit
+    """, (toll_amount, account_id, toll_amount, 15.0, 'SUCCESS', False, tag_id, plaza_id))
+
+
+@instrumented("deduct_toll_if_funded")
+def deduct_toll_if_funded(cur, account_id, tag_id, toll_amount, plaza_id="PLZ001"):
+    """
+        Check-and-debit in one statement: the balance is only lowered if it still covers
+        the toll when the row is locked, and the transaction row is written alongside it.
+        Returns {"paid": bool, "balance": new or current balance}, or None if the account
+        is missing or inactive.
+    """
+    cur.execute("""
+        WITH acct AS (
+            SELECT balance FROM accounts
+            WHERE account_id = %(account_id)s AND is_active = TRUE
+        ),
+        debit AS (
+            UPDATE accounts
+            SET balance = balance - %(amount)s
+            WHERE account_id = %(account_id)s AND is_active = TRUE AND balance >= %(amount)s
+            RETURNING balance
+        ),
+        txn AS (
+            INSERT INTO toll_transactions (
+                transaction_id, timestamp, amount, distance, status, security_flag, rfid_tag_id, plaza_id
+            )
+            SELECT gen_random_uuid(), NOW(), %(amount)s, %(distance)s, 'SUCCESS', FALSE, %(tag_id)s, %(plaza_id)s
+            FROM debit
+        )
+        SELECT (SELECT balance FROM debit), (SELECT balance FROM acct)
+    """, {"account_id": account_id, "amount": toll_amount, "distance": 15.0, "tag_id": tag_id, "plaza_id": plaza_id})
+    new_balance, current_balance = cur.fetchone()
+
+    if new_balance is not None:
+        return {"paid": True, "balance": new_balance}
+    if current_balance is None:
+        return None
+    return {"paid": False, "balance": current_balance}
@@ -1,14 +1,18 @@
 import uuid
 from datetime import datetime, timedelta
+from modules.watchlist import watchlist
+from modules.resolution_cache import resolution_cache
 from modules.rfid import assign_rfid_to_vehicle
 
 def get_vehicle(cur, plate):
-    cur.execute("""
-        SELECT vehicle_id, vehicle_type, owner_id
-        FROM vehicles
-        WHERE license_plate = %s
-    """, (plate,))
-    return cur.fetchone()
+    def load():
+        cur.execute("""
+            SELECT vehicle_id, vehicle_type, owner_id
+            FROM vehicles
+            WHERE license_plate = %s
+        """, (plate,))
+        return cur.fetchone()
+    return resolution_cache.lookup("vehicle", "plate", plate, load, refs=lambda row: (("vehicle", row[0]),))
 
 
 
@@ -44,6 +48,9 @@ def blacklist_tag(cur, tag_id, reason, severity, reporter="System"):
         INSERT INTO blacklisted_rfid (tag_id, reason, blacklistedDate, reportedBy, severity)
         VALUES (%s, %s, %s, %s, %s)
     """, (tag_id, reason, datetime.now(), reporter, severity))
+    # Flag the tag for this process right away, the NOTIFY trigger covers the others
+    watchlist.add_blacklisted_tag(tag_id, reason, severity)
+    resolution_cache.invalidate(tag_id=tag_id)
 
 
 def get_toll_rate(cur, vehicle_type):
@@ -96,6 +103,9 @@ def register_vehicle_with_rfid(cur, payload):
         VALUES (%s, TRUE, %s, %s, %s)
     """, (tag_id, issue_date, expiry_date, vehicle_id))
 
+    # Make the registration visible to the toll path immediately
+    resolution_cache.invalidate(license_plate=license_plate, tag_id=tag_id)
+
     return {
         "vehicle_id": vehicle_id,
         "tag_id": tag_id,
@@ -103,16 +113,15 @@ def register_vehicle_with_rfid(cur, payload):
     }
 
 def get_vehicle_by_tag(cur, tag_id):
-    cur.execute("""
-        SELECT v.vehicle_id, v.vehicle_type, v.owner_id
-        FROM vehicles v
-        JOIN rfid_tags r ON v.vehicle_id = r.vehicle_id
-        WHERE r.tag_id = %s AND r.is_active = TRUE
-    """, (tag_id,))
-    return cur.fetchone()
+    def load():
+        cur.execute("""
+            SELECT v.vehicle_id, v.vehicle_type, v.owner_id
+            FROM vehicles v
+            JOIN rfid_tags r ON v.vehicle_id = r.vehicle_id
+            WHERE r.tag_id = %s AND r.is_active = TRUE
+        """, (tag_id,))
+        return cur.fetchone()
+    return resolution_cache.lookup("vehicle", "tag", tag_id, load, refs=lambda row: (("vehicle", row[0]),))
 
 def check_tag_status(cur, tag_id):
-    cur.execute("""
-        SELECT 1 FROM blacklisted_rfid WHERE tag_id = %s
-    """, (tag_id,))
-    return "BLACKLISTED" if cur.fetchone() else "OK"
+    return "BLACKLISTED" if watchlist.blacklisted_tag(tag_id, cur) else "OK"
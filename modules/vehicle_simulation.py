@@ -3,33 +3,17 @@ import random
 from datetime import datetime
 from modules.sql import process_vehicle_entry
 from modules.logger import plate_logger
-import psycopg2
-import json
-
-# Load config for optional direct DB reads (plazas)
-with open("configs/config.json") as f:
-    db_config = json.load(f)
-
-conn = psycopg2.connect(
-    dbname=db_config["database"],
-    user=db_config["username"],
-    password=db_config["password"],
-    host=db_config["host"],
-    port=db_config["port"]
-)
-conn.autocommit = True
-cur = conn.cursor()
-
-# Fetch all valid license plates
-cur.execute("SELECT license_plate FROM vehicles")
-vehicles = [row[0] for row in cur.fetchall()]
-
-# Fetch toll plazas
-cur.execute("SELECT plaza_id FROM toll_plazas")
-toll_plazas = [row[0] for row in cur.fetchall()]
-
-cur.close()
-conn.close()
+from modules.db_pool import pooled_connection
+
+# Direct DB reads (plates, plazas) share the same pool as the toll path
+with pooled_connection() as conn, conn.cursor() as cur:
+    # Fetch all valid license plates
+    cur.execute("SELECT license_plate FROM vehicles")
+    vehicles = [row[0] for row in cur.fetchall()]
+
+    # Fetch toll plazas
+    cur.execute("SELECT plaza_id FROM toll_plazas")
+    toll_plazas = [row[0] for row in cur.fetchall()]
 
 plate_logger.info("🚦 Starting real-time vehicle toll simulation...")
 
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import math
+import select
+import threading
+import time
+
+import psycopg2
+
+from modules.db_pool import load_db_config, pooled_connection
+from modules.logger import alert_logger, general_logger
+from modules.resolution_cache import resolution_cache
+from modules.settings import load_settings
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        # Standard sizing: m = -n ln p / (ln 2)^2, k = m/n ln 2
+        self.size = max(int(-capacity * math.log(error_rate) / 0.4804530139182014), 64)
+        self.hashes = max(int(round(self.size / capacity * 0.6931471805599453)), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class Watchlist:
+    """
+        Memory-resident copy of blacklisted_rfid and the active rows of stolen_vehicle_registry.
+        Both lists sit in dicts (optionally fronted by a Bloom filter), so the clean-vehicle
+        case needs no database call. The copy is kept exact by incremental updates from
+        blacklist_tag, by the NOTIFY listener (db_scripts/watchlist.sql) and by a full
+        reload every max_age seconds; a miss is therefore authoritative.
+    """
+
+    def __init__(self, max_age=3600.0, use_bloom=True, bloom_error_rate=0.001):
+        self.max_age = max_age
+        self.use_bloom = use_bloom
+        self.bloom_error_rate = bloom_error_rate
+        self._lock = threading.Lock()
+        self._tags = {}            # tag_id -> (reason, severity)
+        self._plates = {}          # licensePlate -> (reportedDate, reportingAgency)
+        self._tag_bloom = None
+        self._plate_bloom = None
+        self._loaded_at = None
+        self._listener = None
+        self._stats = {"loads": 0, "lookups": 0, "bloom_rejects": 0, "hits": 0, "updates": 0}
+
+    # ---- loading ----
+
+    def _build_bloom(self, keys):
+        if not self.use_bloom:
+            return None
+        # Leave head-room for incremental adds before the next full reload
+        bloom = BloomFilter(max(len(keys) * 2, 1024), self.bloom_error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def load(self, cur):
+        cur.execute("""
+            SELECT tag_id, reason, severity FROM blacklisted_rfid
+            ORDER BY blacklistID
+        """)
+        tags = {}
+        for tag_id, reason, severity in cur.fetchall():
+            tags.setdefault(tag_id, (reason, severity))
+
+        cur.execute("""
+            SELECT licensePlate, reportedDate, reportingAgency FROM stolen_vehicle_registry
+            WHERE status = TRUE
+            ORDER BY registerID
+        """)
+        plates = {}
+        for plate, reported_date, agency in cur.fetchall():
+            plates.setdefault(plate, (reported_date, agency))
+
+        tag_bloom, plate_bloom = self._build_bloom(tags), self._build_bloom(plates)
+        with self._lock:
+            self._tags, self._plates = tags, plates
+            self._tag_bloom, self._plate_bloom = tag_bloom, plate_bloom
+            self._loaded_at = time.monotonic()
+            self._stats["loads"] += 1
+        general_logger.info(f"Watchlist loaded: {len(tags)} blacklisted tags, {len(plates)} stolen plates")
+
+    def refresh(self, cur=None):
+        if cur is not None:
+            self.load(cur)
+            return
+        with pooled_connection() as conn, conn.cursor() as cur:
+            self.load(cur)
+
+    def _ensure_fresh(self, cur=None):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.max_age:
+            self.refresh(cur)
+
+    # ---- lookups ----
+
+    def _lookup(self, entries, bloom, key):
+        self._stats["lookups"] += 1
+        if key is None:
+            return None
+        if bloom is not None and key not in bloom:
+            self._stats["bloom_rejects"] += 1
+            return None
+        found = entries.get(key)
+        if found is not None:
+            self._stats["hits"] += 1
+        return found
+
+    def blacklisted_tag(self, tag_id, cur=None):
+        """(reason, severity) when the tag is blacklisted, otherwise None."""
+        self._ensure_fresh(cur)
+        return self._lookup(self._tags, self._tag_bloom, tag_id)
+
+    def stolen_vehicle(self, license_plate, cur=None):
+        """(reportedDate, reportingAgency) when the plate is reported stolen, otherwise None."""
+        self._ensure_fresh(cur)
+        return self._lookup(self._plates, self._plate_bloom, license_plate)
+
+    # ---- incremental updates ----
+
+    def add_blacklisted_tag(self, tag_id, reason, severity):
+        with self._lock:
+            self._tags.setdefault(tag_id, (reason, severity))
+            if self._tag_bloom is not None:
+                self._tag_bloom.add(tag_id)
+            self._stats["updates"] += 1
+
+    def add_stolen_vehicle(self, license_plate, reported_date=None, agency=None):
+        with self._lock:
+            self._plates.setdefault(license_plate, (reported_date, agency))
+            if self._plate_bloom is not None:
+                self._plate_bloom.add(license_plate)
+            self._stats["updates"] += 1
+
+    def apply_change(self, payload):
+        """Apply one NOTIFY payload emitted by the triggers in db_scripts/watchlist.sql."""
+        change = json.loads(payload)
+        row, op = change["row"], change["op"]
+        if change["table"] == "blacklisted_rfid":
+            if op == "DELETE":
+                # Another row may still blacklist the same tag; only a reload knows.
+                # Bloom bits are never cleared, the dict behind them keeps answers exact.
+                self.invalidate()
+            else:
+                self.add_blacklisted_tag(row["tag_id"], row["reason"], row["severity"])
+        elif change["table"] == "stolen_vehicle_registry":
+            if op != "DELETE" and row.get("status"):
+                self.add_stolen_vehicle(row["licenseplate"], row.get("reporteddate"), row.get("reportingagency"))
+            else:
+                self.invalidate()
+        # Tag, vehicle and account changes only matter to cached toll passages
+        elif change["table"] == "rfid_tags":
+            # The tag's own entries, plate entries that resolved to it, and everything
+            # cached about the vehicle it belongs to now (its plate's active tag may change)
+            resolution_cache.invalidate(tag_id=row["tag_id"])
+            resolution_cache.invalidate_refs(("vehicle", row.get("vehicle_id")))
+        elif change["table"] == "vehicles":
+            resolution_cache.invalidate_refs(("vehicle", row["vehicle_id"]))
+            resolution_cache.invalidate(license_plate=row.get("license_plate"))
+        elif change["table"] == "accounts":
+            resolution_cache.invalidate_refs(("account", row["account_id"]), ("owner", row.get("owner_id")))
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    # ---- LISTEN/NOTIFY ----
+
+    def start_listener(self, channel="watchlist_changes"):
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen, args=(channel,), name="watchlist-listener", daemon=True)
+        self._listener.start()
+
+    def _listen(self, channel):
+        db_config = load_db_config()
+        while True:
+            conn = None
+            try:
+                # Dedicated connection: a LISTEN session must not go back to the shared pool
+                conn = psycopg2.connect(
+                    dbname=db_config["database"],
+                    user=db_config["username"],
+                    password=db_config["password"],
+                    host=db_config["host"],
+                    port=db_config["port"]
+                )
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {channel}")
+                    # Anything changed while we were not listening is picked up by a reload
+                    self.load(cur)
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.apply_change(conn.notifies.pop(0).payload)
+            except Exception as e:
+                alert_logger.error(f"Watchlist listener error, reconnecting: {e}")
+                self.invalidate()
+                if conn is not None:
+                    conn.close()
+                time.sleep(5)
+
+    def stats(self):
+        loaded_at = self._loaded_at
+        return {
+            "blacklisted_tags": len(self._tags),
+            "stolen_plates": len(self._plates),
+            "bloom": self.use_bloom,
+            "listening": self._listener is not None,
+            "age_seconds": None if loaded_at is None else round(time.monotonic() - loaded_at, 1),
+            **self._stats,
+        }
+
+
+_settings = load_settings("WATCHLIST")
+watchlist = Watchlist(
+    max_age=_settings.getfloat("max_age", fallback=3600.0),
+    use_bloom=_settings.getboolean("bloom", fallback=True),
+    bloom_error_rate=_settings.getfloat("bloom_error_rate", fallback=0.001)
+)
+watchlist_listen = _settings.getboolean("listen", fallback=True)